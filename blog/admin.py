@@ -6,4 +6,6 @@ from blog.admin_modules.tag_admin import *
 from blog.admin_modules.article_admin import *
 from blog.admin_modules.export_import import *
 from blog.admin_modules.staticpage_admin import *
-from blog.admin_modules.comment_admin import *
\ No newline at end of file
+from blog.admin_modules.comment_admin import *
+from blog.admin_modules.job_admin import *
+from blog.admin_modules.lead_admin import *
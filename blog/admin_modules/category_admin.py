@@ -4,14 +4,15 @@ from django.contrib import admin
 from django import forms
 from blog.models import Category
 from blog.utils import transliterate
-import os
-import sqlite3
+from blog.cache_utils import defer_cache_invalidation
 import pandas as pd
-from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.urls import path
 from blog.forms import UploadFileWithFormatForm, ExportFormatForm, GoogleSheetURLForm
 from blog.google_sheets import get_google_sheets_data
+from blog.jobs import enqueue_export
+from blog.importers import sqlite_rows, uploaded_file_path
+from blog.admin_modules.job_admin import redirect_to_job
 
 # Админская форма для модели Category
 class CategoryAdminForm(forms.ModelForm):
@@ -42,7 +43,7 @@ class CategoryAdmin(admin.ModelAdmin):
         ]
         return custom_urls + urls
 
-    # Импорт данных
+    # Импорт данных: выполняется сразу, без фоновой задачи — таблица небольшая
     def import_data(self, request):
         if request.method == 'POST':
             form = UploadFileWithFormatForm(request.POST, request.FILES)
@@ -63,34 +64,20 @@ class CategoryAdmin(admin.ModelAdmin):
         return render(request, "admin/upload.html", {"form": form})
 
     # Импорт данных из SQLite
+    @defer_cache_invalidation()
     def import_from_sqlite(self, sqlite_file):
-        upload_dir = 'uploads'
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, sqlite_file.name)
-        with open(file_path, 'wb+') as destination:
-            for chunk in sqlite_file.chunks():
-                destination.write(chunk)
-
-        conn = sqlite3.connect(file_path)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT id, name, title, h1, description FROM parsed_categories')
-        rows = cursor.fetchall()
-
-        for row in rows:
-            category_id, name, title, h1, description = row
-            Category.objects.update_or_create(
-                id=category_id,
-                defaults={
-                    'name': name,
-                    'title': title,
-                    'h1': h1,
-                    'description': description
-                }
-            )
-
-        conn.close()
-        os.remove(file_path)
+        with uploaded_file_path(sqlite_file, suffix='.sqlite') as file_path:
+            rows = sqlite_rows(file_path, 'SELECT id, name, title, h1, description FROM parsed_categories')
+            for row in rows:
+                Category.objects.update_or_create(
+                    id=row['id'],
+                    defaults={
+                        'name': row['name'],
+                        'title': row['title'],
+                        'h1': row['h1'],
+                        'description': row['description']
+                    }
+                )
 
     # Экспорт данных
     def export_data(self, request):
@@ -99,62 +86,12 @@ class CategoryAdmin(admin.ModelAdmin):
             if form.is_valid():
                 export_format = form.cleaned_data['export_format']
 
-                if export_format == 'excel':
-                    return self.export_to_excel(request)
-                elif export_format == 'sqlite':
-                    return self.export_sqlite_data(request)
+                return redirect_to_job(self, request, enqueue_export('category', export_format))
 
         else:
             form = ExportFormatForm()
         return render(request, "admin/export.html", {"form": form})
 
-    # Экспорт в Excel
-    def export_to_excel(self, request):
-        categories = Category.objects.all().values('id', 'name', 'title', 'h1', 'description')
-        df = pd.DataFrame(categories)
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename=categories.xlsx'
-        df.to_excel(response, index=False)
-        return response
-
-    # Экспорт в SQLite
-    def export_sqlite_data(self, request):
-        export_file_path = '/tmp/exported_category_data.sqlite'
-        os.makedirs(os.path.dirname(export_file_path), exist_ok=True)
-        conn = sqlite3.connect(export_file_path)
-        cursor = conn.cursor()
-
-        cursor.execute('DROP TABLE IF EXISTS parsed_categories')
-        cursor.execute('''
-            CREATE TABLE parsed_categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                title TEXT,
-                h1 TEXT,
-                description TEXT
-            )
-        ''')
-
-        for category in Category.objects.all():
-            cursor.execute('''
-                INSERT INTO parsed_categories (id, name, title, h1, description)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                category.id,
-                category.name,
-                category.title,
-                category.h1,
-                category.description
-            ))
-
-        conn.commit()
-        conn.close()
-
-        with open(export_file_path, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/x-sqlite3')
-            response['Content-Disposition'] = f'attachment; filename="exported_category_data.sqlite"'
-            return response
-
     # Импорт данных из Google Sheets
     def import_google_sheets(self, request):
         if request.method == 'POST':
@@ -171,6 +108,7 @@ class CategoryAdmin(admin.ModelAdmin):
         return render(request, "admin/import_google_sheets.html", {"form": form})
 
     # Импорт данных из DataFrame
+    @defer_cache_invalidation()
     def import_from_dataframe(self, df):
         for _, row in df.iterrows():
             Category.objects.update_or_create(
@@ -1,7 +1,8 @@
 # blog/admin_modules/comment_admin.py
 
 from django.contrib import admin
-from blog.models import Comment
+from django.db import transaction
+from blog.models import Comment, recalculate_post_ratings
 
 # Регистрация модели Comment в админке
 @admin.register(Comment)
@@ -12,5 +13,9 @@ class CommentAdmin(admin.ModelAdmin):
     actions = ['approve_comments']
 
     def approve_comments(self, request, queryset):
-        queryset.update(approved=True)
+        # update() не вызывает сигналы, поэтому рейтинги затронутых постов пересчитываем явно
+        with transaction.atomic():
+            post_ids = set(queryset.filter(approved=False).values_list('post_id', flat=True))
+            queryset.update(approved=True)
+            recalculate_post_ratings(post_ids)
     approve_comments.short_description = "Одобрить выбранные комментарии"
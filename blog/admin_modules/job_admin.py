@@ -0,0 +1,89 @@
+# blog/admin_modules/job_admin.py
+
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+from blog.models import Job
+
+# Фоновые задачи импорта/экспорта: только просмотр, создаются из админок моделей
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'target', 'status', 'progress', 'processed_rows', 'throughput',
+                    'created_at', 'heartbeat_at', 'finished_at', 'result_link')
+    list_filter = ('status', 'kind', 'target')
+    readonly_fields = ('kind', 'target', 'status', 'params', 'progress', 'total_rows', 'processed_rows',
+                       'created_rows', 'updated_rows', 'unchanged_rows', 'skipped_rows', 'checkpoint',
+                       'throughput', 'worker', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+                       'result_link', 'preview_table', 'errors')
+    exclude = ('source_file', 'result_file')
+    actions = ['requeue_jobs', 'restart_jobs']
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_result), name='blog_job_download'),
+        ]
+        return custom_urls + urls
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress(self, obj):
+        if obj.total_rows is None:
+            return '—'
+        return f"{obj.progress_percent()}% ({obj.processed_rows} из {obj.total_rows})"
+    progress.short_description = "Прогресс"
+
+    def throughput(self, obj):
+        return f"{obj.rows_per_second()} строк/с"
+    throughput.short_description = "Скорость"
+
+    def result_link(self, obj):
+        if not obj.result_file:
+            return '—'
+        return format_html('<a href="{}">Скачать</a>', reverse('admin:blog_job_download', args=[obj.pk]))
+    result_link.short_description = "Результат"
+
+    def preview_table(self, obj):
+        if not obj.preview:
+            return '—'
+        actions = {'insert': 'Добавится', 'update': 'Обновится'}
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((actions.get(item['action'], item['action']), item['id'] or '—', item['name']) for item in obj.preview)
+        )
+        return format_html('<table><tr><th>Действие</th><th>id</th><th>name</th></tr>{}</table>', rows)
+    preview_table.short_description = "Предпросмотр изменений"
+
+    # Файлы задач лежат вне MEDIA_ROOT и отдаются только через админку
+    def download_result(self, request, pk):
+        job = get_object_or_404(Job, pk=pk)
+        if not self.has_view_permission(request, job) or not job.result_file:
+            raise Http404
+        return FileResponse(job.result_file.open('rb'), as_attachment=True,
+                            filename=job.result_file.name.rsplit('/', 1)[-1])
+
+    # Импорт продолжится с сохранённого чекпоинта
+    def requeue_jobs(self, request, queryset):
+        requeued = queryset.filter(status=Job.STATUS_FAILED).update(
+            status=Job.STATUS_PENDING, finished_at=None, worker=''
+        )
+        self.message_user(request, f"Возвращено в очередь: {requeued}")
+    requeue_jobs.short_description = "Продолжить задачи с ошибкой"
+
+    def restart_jobs(self, request, queryset):
+        restarted = queryset.exclude(status=Job.STATUS_RUNNING).exclude(source_file='', kind=Job.KIND_IMPORT).update(
+            status=Job.STATUS_PENDING, checkpoint=0, total_rows=None, processed_rows=0, created_rows=0,
+            updated_rows=0, unchanged_rows=0, skipped_rows=0, errors='', preview=[], worker='',
+            started_at=None, heartbeat_at=None, finished_at=None,
+        )
+        self.message_user(request, f"Запущено заново: {restarted}")
+    restart_jobs.short_description = "Запустить задачи заново с начала"
+
+
+# Ответ админки после постановки задачи в очередь: переход на страницу с прогрессом
+def redirect_to_job(model_admin, request, job):
+    model_admin.message_user(request, f"Задача «{job}» поставлена в очередь. Прогресс — на этой странице.")
+    return redirect('admin:blog_job_change', job.pk)
@@ -0,0 +1,26 @@
+# blog/admin_modules/lead_admin.py
+
+from django.contrib import admin
+from blog.leads import requeue_dead_leads
+from blog.models import OutboundLead
+
+# Очередь заявок партнёру: только просмотр и повторная отправка, создаются формой заказа
+@admin.register(OutboundLead)
+class OutboundLeadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'email', 'status', 'attempts', 'response_status', 'created_at', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('payload', 'status', 'attempts', 'next_attempt_at', 'response_status', 'last_error',
+                       'created_at', 'sent_at')
+    actions = ['requeue_leads']
+
+    def has_add_permission(self, request):
+        return False
+
+    def email(self, obj):
+        return obj.payload.get('Email') or '—'
+    email.short_description = "Email"
+
+    def requeue_leads(self, request, queryset):
+        requeued = requeue_dead_leads(queryset)
+        self.message_user(request, f"Возвращено в очередь: {requeued}")
+    requeue_leads.short_description = "Отправить заново недоставленные заявки"
@@ -4,14 +4,15 @@ from django.contrib import admin
 from django import forms
 from blog.models import Tag
 from blog.utils import transliterate
-import os
-import sqlite3
+from blog.cache_utils import defer_cache_invalidation
 import pandas as pd
-from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.urls import path
 from blog.forms import UploadFileWithFormatForm, ExportFormatForm, GoogleSheetURLForm
 from blog.google_sheets import get_google_sheets_data
+from blog.jobs import enqueue_export
+from blog.importers import sqlite_rows, uploaded_file_path
+from blog.admin_modules.job_admin import redirect_to_job
 
 # Админская форма для модели Tag
 class TagAdminForm(forms.ModelForm):
@@ -42,7 +43,7 @@ class TagAdmin(admin.ModelAdmin):
         ]
         return custom_urls + urls
 
-    # Импорт данных
+    # Импорт данных: выполняется сразу, без фоновой задачи — таблица небольшая
     def import_data(self, request):
         if request.method == 'POST':
             form = UploadFileWithFormatForm(request.POST, request.FILES)
@@ -63,6 +64,7 @@ class TagAdmin(admin.ModelAdmin):
         return render(request, "admin/upload.html", {"form": form})
 
     # Импорт данных из DataFrame
+    @defer_cache_invalidation()
     def import_from_dataframe(self, df):
         for _, row in df.iterrows():
             Tag.objects.update_or_create(
@@ -76,34 +78,20 @@ class TagAdmin(admin.ModelAdmin):
             )
 
     # Импорт данных из SQLite
+    @defer_cache_invalidation()
     def import_from_sqlite(self, sqlite_file):
-        upload_dir = 'uploads'
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, sqlite_file.name)
-        with open(file_path, 'wb+') as destination:
-            for chunk in sqlite_file.chunks():
-                destination.write(chunk)
-
-        conn = sqlite3.connect(file_path)
-        cursor = conn.cursor()
-
-        cursor.execute('SELECT id, name, title, h1, description FROM parsed_tags')
-        rows = cursor.fetchall()
-
-        for row in rows:
-            tag_id, name, title, h1, description = row
-            Tag.objects.update_or_create(
-                id=tag_id,
-                defaults={
-                    'name': name,
-                    'title': title,
-                    'h1': h1,
-                    'description': description
-                }
-            )
-
-        conn.close()
-        os.remove(file_path)
+        with uploaded_file_path(sqlite_file, suffix='.sqlite') as file_path:
+            rows = sqlite_rows(file_path, 'SELECT id, name, title, h1, description FROM parsed_tags')
+            for row in rows:
+                Tag.objects.update_or_create(
+                    id=row['id'],
+                    defaults={
+                        'name': row['name'],
+                        'title': row['title'],
+                        'h1': row['h1'],
+                        'description': row['description']
+                    }
+                )
 
     # Экспорт данных
     def export_data(self, request):
@@ -112,62 +100,12 @@ class TagAdmin(admin.ModelAdmin):
             if form.is_valid():
                 export_format = form.cleaned_data['export_format']
 
-                if export_format == 'excel':
-                    return self.export_to_excel(request)
-                elif export_format == 'sqlite':
-                    return self.export_sqlite_data(request)
+                return redirect_to_job(self, request, enqueue_export('tag', export_format))
 
         else:
             form = ExportFormatForm()
         return render(request, "admin/export.html", {"form": form})
 
-    # Экспорт в Excel
-    def export_to_excel(self, request):
-        tags = Tag.objects.all().values('id', 'name', 'title', 'h1', 'description')
-        df = pd.DataFrame(tags)
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename=tags.xlsx'
-        df.to_excel(response, index=False)
-        return response
-
-    # Экспорт в SQLite
-    def export_sqlite_data(self, request):
-        export_file_path = '/tmp/exported_tag_data.sqlite'
-        os.makedirs(os.path.dirname(export_file_path), exist_ok=True)
-        conn = sqlite3.connect(export_file_path)
-        cursor = conn.cursor()
-
-        cursor.execute('DROP TABLE IF EXISTS parsed_tags')
-        cursor.execute('''
-            CREATE TABLE parsed_tags (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                title TEXT,
-                h1 TEXT,
-                description TEXT
-            )
-        ''')
-
-        for tag in Tag.objects.all():
-            cursor.execute('''
-                INSERT INTO parsed_tags (id, name, title, h1, description)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                tag.id,
-                tag.name,
-                tag.title,
-                tag.h1,
-                tag.description
-            ))
-
-        conn.commit()
-        conn.close()
-
-        with open(export_file_path, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/x-sqlite3')
-            response['Content-Disposition'] = f'attachment; filename="exported_tag_data.sqlite"'
-            return response
-
     # Импорт данных из Google Sheets
     def import_google_sheets(self, request):
         if request.method == 'POST':
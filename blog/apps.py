@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class BlogConfig(AppConfig):
+    name = 'blog'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (инвалидация кэша и т.п.)
+        from blog import signals  # noqa: F401
@@ -0,0 +1,212 @@
+# blog/autocomplete.py
+
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from django.db import connections
+from django.urls import reverse
+from blog.models import Post, ArticlePost, Tag, Category
+from blog.cache_utils import get_cache_version, BLOG_NAMESPACE, ARTICLES_NAMESPACE
+
+# Источники подсказок: (тип, модель, поле с текстом, имя URL)
+SOURCES = [
+    ('category', Category, 'name', 'category_detail'),
+    ('tag', Tag, 'name', 'tagged'),
+    ('post', Post, 'h1', 'post_detail'),
+    ('article', ArticlePost, 'h1', 'article_post_detail'),
+]
+KIND_PRIORITY = {kind: position for position, (kind, _, _, _) in enumerate(SOURCES)}
+URL_NAMES = {kind: url_name for kind, _, _, url_name in SOURCES}
+
+# Как часто (в секундах) сверять версию кэша, чтобы пересобрать индекс после изменений
+VERSION_CHECK_INTERVAL = 5
+# Минимальная доля триграмм запроса, которые должны найтись в тексте
+FUZZY_THRESHOLD = 0.6
+# Слишком частые триграммы почти ничего не дают для поиска опечаток, но дорого стоят
+MAX_POSTING_LENGTH = 20000
+# Сколько слов с нужным префиксом просматривать; для коротких частых префиксов
+# этого с запасом хватает, чтобы набрать 20 лучших подсказок
+MAX_PREFIX_CANDIDATES = 5000
+
+logger = logging.getLogger(__name__)
+
+_word_re = re.compile(r'\w+')
+
+
+def normalize(value):
+    return ' '.join(_word_re.findall((value or '').lower().replace('ё', 'е')))
+
+
+def trigrams(value):
+    # Триграммы каждого слова отдельно, как в pg_trgm: на стыке слов («я п» в
+    # «курсовая право») получались триграммы, которых нет в других формах фразы
+    result = set()
+    for word in value.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class PrefixIndex:
+    """
+    Индекс подсказок в памяти процесса: отсортированный список слов для
+    поиска по префиксу и триграммы для поиска с опечатками.
+    """
+
+    def __init__(self, entries):
+        # entries: список (label, kind, slug). Записи заранее упорядочены по
+        # релевантности (тип, длина), поэтому позиция записи и есть её ранг
+        entries = sorted(entries, key=lambda entry: (KIND_PRIORITY[entry[1]], len(entry[0]), entry[0]))
+        self.entries = entries
+        self.normalized = [normalize(label) for label, _, _ in entries]
+
+        words = []
+        postings = defaultdict(list)
+        for position, text in enumerate(self.normalized):
+            for word in set(text.split()):
+                words.append((word, position))
+            for trigram in trigrams(text):
+                postings[trigram].append(position)
+        words.sort()
+        self.words = words
+        self.postings = dict(postings)
+
+    @classmethod
+    def build(cls):
+        entries = []
+        for kind, model, field, _ in SOURCES:
+            for label, slug in model.objects.exclude(**{f'{field}__isnull': True}).values_list(field, 'slug').iterator():
+                if label and slug:
+                    entries.append((label, kind, slug))
+        return cls(entries)
+
+    def _prefix_range(self, token):
+        # Позиции в self.words, где слова начинаются с token
+        return bisect_left(self.words, (token,)), bisect_left(self.words, (token + '\U0010ffff',))
+
+    def _prefix_matches(self, tokens):
+        # Кандидаты по слову запроса с самым узким диапазоном (самому редкому
+        # префиксу), затем проверка остальных слов. Длина слова редкость не
+        # говорит: «курсовая» длиннее «праву», но встречается в тысячах названий
+        start, end = min((self._prefix_range(token) for token in tokens), key=lambda bounds: bounds[1] - bounds[0])
+        candidates = {position for _, position in self.words[start:min(end, start + MAX_PREFIX_CANDIDATES)]}
+
+        matches = []
+        for position in candidates:
+            text_words = self.normalized[position].split()
+            if all(any(word.startswith(token) for word in text_words) for token in tokens):
+                matches.append(position)
+        return matches
+
+    def _fuzzy_matches(self, query, limit):
+        counts = Counter()
+        # Пропущенные частые триграммы не учитываются и в знаменателе: иначе
+        # запрос из частых слов никогда не набрал бы FUZZY_THRESHOLD
+        used = 0
+        for trigram in trigrams(query):
+            posting = self.postings.get(trigram, ())
+            if len(posting) <= MAX_POSTING_LENGTH:
+                counts.update(posting)
+                used += 1
+        if not used:
+            return []
+
+        # Доля триграмм запроса, найденных в тексте (как word_similarity в pg_trgm)
+        scored = [
+            (shared / used, position)
+            for position, shared in counts.items()
+            if shared / used >= FUZZY_THRESHOLD
+        ]
+        return [position for _, position in heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1]))]
+
+    def search(self, query, limit=20):
+        query = normalize(query)
+        if not query:
+            return []
+
+        # Сначала тексты, начинающиеся с запроса, затем по рангу записи
+        positions = heapq.nsmallest(
+            limit, self._prefix_matches(query.split()),
+            key=lambda position: (not self.normalized[position].startswith(query), position)
+        )
+        if len(positions) < limit:
+            seen = set(positions)
+            for position in self._fuzzy_matches(query, limit * 2):
+                if position not in seen:
+                    positions.append(position)
+                    if len(positions) >= limit:
+                        break
+        return [self.entries[position] for position in positions]
+
+
+_index = None
+_index_version = None
+_last_check = 0.0
+# Держит тот, кто собирает индекс: первый запрос процесса или фоновый поток пересборки
+_lock = threading.Lock()
+
+
+def _current_version():
+    return (get_cache_version(BLOG_NAMESPACE), get_cache_version(ARTICLES_NAMESPACE))
+
+
+def _rebuild_in_background(version):
+    # Запускается с захваченным _lock и отпускает его по завершении
+    global _index, _index_version
+    try:
+        index = PrefixIndex.build()
+        _index, _index_version = index, version
+    except Exception:
+        logger.exception("Не удалось пересобрать индекс подсказок")
+    finally:
+        # У потока своё соединение с БД, после сборки оно больше не нужно
+        connections.close_all()
+        _lock.release()
+
+
+def get_index():
+    """
+    Возвращает индекс процесса. Если с момента сборки изменились работы,
+    статьи, теги или категории (по версиям кэша), индекс пересобирается в
+    фоновом потоке, а запросы до подмены получают прежний. Синхронно индекс
+    строится только при первом обращении процесса, когда отдавать ещё нечего.
+    """
+    global _index, _index_version, _last_check
+
+    now = time.monotonic()
+    if _index is not None and now - _last_check < VERSION_CHECK_INTERVAL:
+        return _index
+
+    version = _current_version()
+    _last_check = now
+    if _index is not None and version == _index_version:
+        return _index
+
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = PrefixIndex.build()
+                _index_version = version
+        return _index
+
+    # Пересборкой уже занят другой поток — он и подменит индекс
+    if not _lock.acquire(blocking=False):
+        return _index
+    try:
+        threading.Thread(target=_rebuild_in_background, args=(version,), daemon=True,
+                         name='autocomplete-rebuild').start()
+    except Exception:
+        _lock.release()
+        raise
+    return _index
+
+
+def autocomplete(query, limit=20):
+    return [
+        {'label': label, 'type': kind, 'url': reverse(URL_NAMES[kind], args=[slug])}
+        for label, kind, slug in get_index().search(query, limit)
+    ]
@@ -0,0 +1,247 @@
+# blog/cache_backends.py
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class TwoTierCache(BaseCache):
+    """
+    Двухуровневый кэш: общий для всех процессов L2 (SQLite, Redis, memcached)
+    и локальный для процесса L1 перед ним.
+
+    В L1 попадают только «горячие» ключи, начинающиеся с L1_KEY_PREFIXES,
+    и живут там L1_TIMEOUT секунд. Запись (set, add, incr) всегда идёт в L2,
+    поэтому блокировки и счётчики общие для всех воркеров. Если в L1 держатся
+    версии кэша (cache_version), другие воркеры увидят новую версию не позже
+    чем через L1_TIMEOUT секунд.
+
+    Пример настройки:
+
+        'default': {
+            'BACKEND': 'blog.cache_backends.TwoTierCache',
+            'OPTIONS': {
+                'L2': 'shared',
+                'L1_TIMEOUT': 5,
+                'L1_KEY_PREFIXES': ['cache_version', 'common_context'],
+            },
+        }
+    """
+
+    _missing = object()
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__({k: v for k, v in params.items() if k != 'OPTIONS'})
+        self._l2_alias = options.get('L2', 'shared')
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._l1_key_prefixes = tuple(options.get('L1_KEY_PREFIXES', ()))
+        self._l1 = LocMemCache(f'two-tier-l1-{location or self._l2_alias}', {
+            'TIMEOUT': self._l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    def _is_hot(self, key):
+        return bool(self._l1_key_prefixes) and str(key).startswith(self._l1_key_prefixes)
+
+    def _l1_set(self, key, value, timeout, version):
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            timeout = min(timeout, self._l1_timeout)
+        else:
+            timeout = self._l1_timeout
+        self._l1.set(key, value, timeout, version=version)
+
+    def get(self, key, default=None, version=None):
+        if self._is_hot(key):
+            value = self._l1.get(key, self._missing, version=version)
+            if value is not self._missing:
+                return value
+            value = self._l2.get(key, self._missing, version=version)
+            if value is self._missing:
+                return default
+            self._l1_set(key, value, None, version)
+            return value
+        return self._l2.get(key, default, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2.set(key, value, timeout, version=version)
+        if self._is_hot(key):
+            self._l1_set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._l2.add(key, value, timeout, version=version)
+        if added and self._is_hot(key):
+            self._l1_set(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1.delete(key, version=version)
+        return self._l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self._is_hot(key) and self._l1.has_key(key, version=version):
+            return True
+        return self._l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1.delete(key, version=version)
+        return self._l2.incr(key, delta, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self._l2.clear()
+
+
+class SQLiteCache(BaseCache):
+    """
+    Общий кэш в файле SQLite для всех процессов одной машины, без отдельного
+    сервиса. Файл работает в режиме WAL: чтения не ждут записи, а записи
+    разных процессов выстраиваются в очередь самим SQLite (busy_timeout).
+
+    add — это INSERT OR IGNORE в одной транзакции с удалением истёкшей
+    записи, поэтому он атомарен между процессами: на нём держатся блокировки
+    single-flight и начальные версии кэша. Лишние записи удаляются раз в
+    CULL_EVERY записей процесса, а не на каждой записи.
+
+    LOCATION — путь к файлу (каталог создаётся при первом подключении).
+    """
+
+    _missing = object()
+
+    # Как часто (в записях одного процесса) удаляются истёкшие и лишние записи
+    CULL_EVERY = 500
+
+    # Сколько миллисекунд ждать, пока другой процесс держит блокировку записи
+    BUSY_TIMEOUT = 5000
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # Своё соединение у каждого потока; после fork (gunicorn --preload) — новое
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=self.BUSY_TIMEOUT / 1000, isolation_level=None)
+            conn.execute(f'PRAGMA busy_timeout = {self.BUSY_TIMEOUT}')
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, sql, params):
+        conn = self._connection()
+        cursor = conn.execute(sql, params)
+        self._writes += 1
+        if self._writes % self.CULL_EVERY == 0:
+            self._cull(conn)
+        return cursor
+
+    def _cull(self, conn):
+        conn.execute('DELETE FROM cache WHERE expires <= ?', [time.time()])
+        if self._max_entries and self._cull_frequency:
+            count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self._max_entries:
+                # Удаляются записи, которые истекают раньше всех (вечные — в последнюю очередь)
+                conn.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    'SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                    [count // self._cull_frequency],
+                )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', [key, time.time()]
+        ).fetchone()
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            [key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self.get_backend_timeout(timeout)],
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        conn = self._connection()
+        # BEGIN IMMEDIATE сразу берёт блокировку записи: между удалением истёкшей
+        # записи и вставкой другой процесс не вклинится
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', [key, time.time()])
+            cursor = self._write(
+                'INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                [key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self.get_backend_timeout(timeout)],
+            )
+            added = cursor.rowcount == 1
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._write(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), key, time.time()],
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute('DELETE FROM cache WHERE key = ?', [key]).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', [key, time.time()]
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            value = self.get(key, self._missing, version=version)
+            if value is self._missing:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            conn.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self.make_and_validate_key(key, version=version)],
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
@@ -0,0 +1,159 @@
+# blog/cache_utils.py
+
+import threading
+import time
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.db import transaction
+
+# Пространство имён кэша для работ: общий контекст сайдбара и списки постов
+BLOG_NAMESPACE = 'blog'
+# Пространство имён кэша для статей: сайдбар статей
+ARTICLES_NAMESPACE = 'articles'
+# Общая версия рейтингов тегов по категориям (меняется при переименовании/удалении тегов)
+CATEGORY_TAGS_NAMESPACE = 'category_tags'
+
+# Версионированные записи можно держать долго: при изменении данных версия
+# пространства имён увеличивается, и старые ключи просто перестают читаться
+VERSIONED_TIMEOUT = 60 * 60 * 24
+
+_state = threading.local()
+
+
+def _version_key(namespace):
+    return f'cache_version:{namespace}'
+
+
+def get_cache_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Начальная версия зависит от времени, чтобы после вытеснения ключа
+        # версии не начались заново с уже использованного значения
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def versioned_key(namespace, key):
+    return f'{key}:v{get_cache_version(namespace)}'
+
+
+def category_namespace(category_id):
+    # Отдельная версия на каждую категорию: изменения постов одной категории
+    # не сбрасывают закэшированные данные остальных
+    return f'category:{category_id}'
+
+
+def _bump(namespace):
+    # Новая версия записывается set, а не incr: версия может держаться в L1
+    # (TwoTierCache), а set обновляет и его. Если два сброса запишут одно значение,
+    # это не страшно: оба выполняются после фиксации своих данных, и новая версия
+    # видит оба изменения
+    key = _version_key(namespace)
+    cache.set(key, max(int(time.time() * 1000), (cache.get(key) or 0) + 1), None)
+
+
+def bump_cache_version(namespace):
+    """
+    Инвалидирует все ключи пространства имён.
+
+    Внутри defer_cache_invalidation() версия увеличивается один раз при выходе
+    из блока, а внутри транзакции — только после её фиксации.
+    """
+    deferred = getattr(_state, 'deferred', None)
+    if deferred is not None:
+        deferred.add(namespace)
+        return
+    transaction.on_commit(lambda: _bump(namespace))
+
+
+@contextmanager
+def defer_cache_invalidation():
+    """
+    Откладывает инвалидацию кэша до конца блока (например, массового импорта),
+    чтобы версия увеличивалась один раз на пачку, а не на каждую строку.
+    Можно использовать и как декоратор.
+    """
+    if getattr(_state, 'deferred', None) is not None:
+        yield
+        return
+
+    _state.deferred = set()
+    try:
+        yield
+    finally:
+        namespaces = _state.deferred
+        _state.deferred = None
+        for namespace in namespaces:
+            bump_cache_version(namespace)
+
+
+# Сколько секунд значение считается свежим; после этого оно ещё отдаётся,
+# пока один процесс пересчитывает его в фоне запроса
+FRESH_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+
+def get_or_build(key, builder, timeout=VERSIONED_TIMEOUT, fresh_timeout=FRESH_TIMEOUT, last_good_key=None):
+    """
+    Single-flight обёртка над кэшем для дорогих пересчётов.
+
+    В кэше хранится пара (значение, момент устаревания). Пересчёт выполняет
+    только тот запрос, который захватил ключ блокировки через cache.add();
+    остальные в это время получают устаревшее значение, а если его нет —
+    последнее посчитанное значение из last_good_key или, без него, недолго
+    ждут, пока значение появится.
+
+    :param key: Ключ кэша
+    :param builder: Функция без аргументов, возвращающая значение
+    :param timeout: Общее время жизни записи в кэше
+    :param fresh_timeout: Время, после которого значение пересчитывается
+    :param last_good_key: Ключ без версии, под которым хранится копия последнего
+        посчитанного значения. После сброса версии под новым ключом ничего нет,
+        и без этой копии все запросы ждали бы, пока один процесс пересчитает значение
+    """
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+
+    if entry is not None:
+        value, refresh_at = entry
+        if time.time() < refresh_at:
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            # Пересчётом уже занят другой процесс — отдаём устаревшее значение
+            return value
+    elif not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        if last_good_key is not None:
+            last_good = cache.get(last_good_key)
+            if last_good is not None:
+                return last_good[0]
+        deadline = time.time() + LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # Держатель блокировки не успел: считаем сами, но не ломаем его запись
+        return builder()
+
+    try:
+        value = builder()
+        entry = (value, time.time() + fresh_timeout)
+        cache.set(key, entry, timeout)
+        if last_good_key is not None:
+            cache.set(last_good_key, entry, timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
+
+
+def get_or_build_versioned(namespace, key, builder, **kwargs):
+    """
+    get_or_build по ключу текущей версии пространства имён. Пока после сброса
+    версии один процесс пересчитывает значение, остальные получают значение
+    прежней версии.
+    """
+    return get_or_build(versioned_key(namespace, key), builder, last_good_key=f'{key}:last', **kwargs)
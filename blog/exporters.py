@@ -0,0 +1,183 @@
+# blog/exporters.py
+
+import csv
+import datetime
+import decimal
+import os
+import sqlite3
+import tempfile
+from collections import defaultdict
+from itertools import islice
+from django.http import FileResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+# Сколько строк читать из БД за раз: память при экспорте не зависит от размера таблицы
+EXPORT_CHUNK_SIZE = 2000
+
+# Поля постов и статей для экспорта (теги добавляются отдельной колонкой)
+POST_EXPORT_FIELDS = [
+    'id', 'name', 'title', 'h1', 'content', 'category__name', 'description',
+    'subject', 'creation_date', 'pages', 'sources', 'price',
+]
+
+# Колонки SQLite-выгрузки постов и статей: формат совпадает с тем, что читает импорт
+POST_SQLITE_COLUMNS = [
+    ('id', 'INTEGER PRIMARY KEY'), ('name', 'TEXT'), ('title', 'TEXT'), ('h1', 'TEXT'),
+    ('content', 'TEXT'), ('category_name', 'TEXT'), ('description', 'TEXT'),
+    ('subject', 'TEXT'), ('creation_date', 'TEXT'), ('pages', 'TEXT'), ('sources', 'TEXT'),
+    ('price', 'REAL'), ('tags', 'TEXT'),
+]
+
+# Колонки SQLite-выгрузки тегов и категорий
+TAXONOMY_EXPORT_FIELDS = ['id', 'name', 'title', 'h1', 'description']
+TAXONOMY_SQLITE_COLUMNS = [
+    ('id', 'INTEGER PRIMARY KEY'), ('name', 'TEXT'), ('title', 'TEXT'), ('h1', 'TEXT'), ('description', 'TEXT'),
+]
+
+
+def iter_export_rows(queryset, fields, with_tags=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Построчно отдаёт значения полей, читая таблицу пачками через iterator().
+    Теги каждой пачки собираются одним запросом к промежуточной таблице
+    и добавляются последней колонкой в виде строки через запятую.
+
+    :param queryset: Queryset модели
+    :param fields: Поля для values_list (первым должен идти id, если with_tags)
+    :param with_tags: Добавлять ли колонку с тегами
+    :param chunk_size: Размер пачки
+    """
+    rows = queryset.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
+    if not with_tags:
+        yield from rows
+        return
+
+    tags_field = queryset.model._meta.get_field('tags')
+    through = tags_field.remote_field.through
+    source = tags_field.m2m_field_name()
+    target = tags_field.m2m_reverse_field_name()
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _with_tags(chunk, through, source, target)
+            chunk = []
+    if chunk:
+        yield from _with_tags(chunk, through, source, target)
+
+
+def _with_tags(chunk, through, source, target):
+    tags = defaultdict(list)
+    pairs = through.objects.filter(**{f'{source}_id__in': [row[0] for row in chunk]}).values_list(
+        f'{source}_id', f'{target}__name'
+    ).order_by('pk')
+    for obj_id, tag_name in pairs:
+        tags[obj_id].append(tag_name)
+    for row in chunk:
+        yield row + (','.join(tags[row[0]]),)
+
+
+def _excel_value(value):
+    if isinstance(value, str):
+        # Управляющие символы openpyxl записать не может
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def write_excel(header, rows, output):
+    """
+    Пишет строки в write-only книгу openpyxl: строки сразу сбрасываются на диск,
+    а не копятся в памяти.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append([_excel_value(value) for value in row])
+    workbook.save(output)
+
+
+def excel_response(header, rows, filename):
+    """
+    Пишет строки во временный файл Excel и отдаёт его через FileResponse.
+    """
+    output = tempfile.TemporaryFile()
+    write_excel(header, rows, output)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def write_csv(header, rows, output):
+    """
+    Пишет CSV в текстовый файл (BOM, чтобы Excel открыл UTF-8 с кириллицей).
+    """
+    output.write('\ufeff')
+    writer = csv.writer(output)
+    writer.writerow(header)
+    writer.writerows(rows)
+
+
+def _sqlite_value(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def write_sqlite(table_name, columns, rows, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Записывает строки в новую таблицу SQLite-файла.
+
+    Журнал и fsync отключены: файл одноразовый, и при сбое его проще собрать
+    заново. Все вставки идут через executemany в одной транзакции.
+
+    :param table_name: Имя таблицы в SQLite
+    :param columns: Список пар (колонка, тип)
+    :param rows: Итератор кортежей значений в порядке колонок
+    :param path: Путь к файлу
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute(
+            f'CREATE TABLE {table_name} ({", ".join(f"{name} {kind}" for name, kind in columns)})'
+        )
+        insert_sql = (
+            f'INSERT INTO {table_name} ({", ".join(name for name, _ in columns)}) '
+            f'VALUES ({", ".join("?" for _ in columns)})'
+        )
+        rows = iter(rows)
+        with conn:
+            while True:
+                batch = [tuple(_sqlite_value(value) for value in row) for row in islice(rows, chunk_size)]
+                if not batch:
+                    break
+                conn.executemany(insert_sql, batch)
+    finally:
+        conn.close()
+
+
+def sqlite_response(table_name, columns, rows, filename):
+    """
+    Записывает строки в SQLite-файл и отдаёт его через FileResponse.
+    Файл создаётся через mkstemp, поэтому параллельные выгрузки не перезаписывают
+    друг друга.
+    """
+    fd, export_file_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        write_sqlite(table_name, columns, rows, export_file_path)
+        output = open(export_file_path, 'rb')
+    finally:
+        # Открытый дескриптор остаётся у FileResponse, имя файла больше не нужно
+        os.remove(export_file_path)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type='application/x-sqlite3')
@@ -27,8 +27,20 @@ class UploadFileWithFormatForm(forms.Form):
         label="Выберите формат файла"
     )
 
+# Импорт постов и статей фоновой задачей (blog/jobs.py): с режимом сравнения и пробным запуском.
+# Теги и категории импортируются сразу и этих параметров не поддерживают
+class JobImportForm(UploadFileWithFormatForm):
+    skip_unchanged = forms.BooleanField(
+        required=False, initial=True,
+        label="Пропускать строки, которые не изменились с прошлого импорта"
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Только показать, что изменится, ничего не записывая"
+    )
+
 class ExportFormatForm(forms.Form):
     export_format = forms.ChoiceField(
-        choices=[('excel', 'Excel'), ('sqlite', 'SQLite')],
+        choices=[('excel', 'Excel'), ('csv', 'CSV'), ('sqlite', 'SQLite')],
         label="Выберите формат экспорта"
     )
\ No newline at end of file
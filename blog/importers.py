@@ -0,0 +1,421 @@
+# blog/importers.py
+
+import hashlib
+import json
+import math
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connection, transaction, IntegrityError
+from blog.models import Post, Category, Tag, ArticlePost, ArticleCategory, ArticleTag
+from blog.utils import transliterate, render_markdown, build_excerpt, UniqueValueResolver
+from blog.search import update_search_vectors
+from blog.sitemaps import sitemap_page_for_id, schedule_sitemap_pages_rebuild, schedule_sitemap_section_rebuild
+from blog.cache_utils import (
+    bump_cache_version, defer_cache_invalidation,
+    BLOG_NAMESPACE, ARTICLES_NAMESPACE, CATEGORY_TAGS_NAMESPACE
+)
+
+# Размер пачки: каждая пачка импортируется в отдельной транзакции
+DEFAULT_CHUNK_SIZE = 1000
+
+# Сколько строк SQLite-источника читается за один fetchmany
+SQLITE_FETCH_SIZE = 500
+
+# Сколько изменений запоминается для предпросмотра (dry run)
+PREVIEW_LIMIT = 200
+
+# Импортируемые поля постов и статей
+IMPORT_FIELDS = [
+    'name', 'title', 'h1', 'content', 'description',
+    'subject', 'creation_date', 'pages', 'sources', 'price',
+]
+
+
+def is_missing(value):
+    # Пустые ячейки pandas приходят как NaN
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def dataframe_rows(df):
+    """
+    Строки DataFrame в виде словарей без NaN.
+    """
+    for record in df.to_dict('records'):
+        yield {key: (None if is_missing(value) else value) for key, value in record.items()}
+
+
+def sqlite_rows(path, query, params=(), fetch_size=SQLITE_FETCH_SIZE):
+    """
+    Строки запроса к SQLite-файлу в виде словарей. Читаются пачками через fetchmany,
+    так что в памяти одновременно не больше fetch_size строк источника.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield dict(zip(columns, row))
+    finally:
+        conn.close()
+
+
+@contextmanager
+def uploaded_file_path(uploaded_file, suffix=''):
+    """
+    Путь к загруженному файлу на диске. Большие загрузки Django уже сохранил во
+    временный файл — читаем его напрямую; маленькие (в памяти) пишутся во временный файл.
+    """
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        yield uploaded_file.temporary_file_path()
+        return
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        for chunk in uploaded_file.chunks():
+            tmp.write(chunk)
+        tmp.flush()
+        yield tmp.name
+
+
+def row_fingerprint(row):
+    """
+    Хэш импортируемого содержимого строки: поля, категория и набор тегов.
+    """
+    payload = json.dumps(
+        [row['values'], row['category'], sorted(set(row['tags']))],
+        sort_keys=True, default=str, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def split_tags(value):
+    if is_missing(value):
+        return []
+    if isinstance(value, (list, tuple)):
+        names = value
+    else:
+        names = str(value).split(',')
+    return [name.strip() for name in names if name and name.strip()]
+
+
+class BulkImporter:
+    """
+    Пакетный импорт постов или статей вместе с категориями и тегами.
+
+    На каждую пачку строк: один запрос на поиск категорий и один на теги,
+    bulk_create недостающих, upsert постов через bulk_create(update_conflicts=True)
+    и массовая запись связей с тегами в промежуточную таблицу.
+
+    :param model: Post или ArticlePost
+    :param category_model: Модель категорий
+    :param tag_model: Модель тегов
+    :param cache_namespaces: Пространства имён кэша, которые сбрасываются после импорта
+    :param unique_names: Подбирать уникальные name/slug для новых записей
+    :param chunk_size: Размер пачки
+    :param skip_unchanged: Режим сравнения: строки без id сопоставляются с записями по name,
+        строки, хэш которых совпадает с сохранённым, не перезаписываются
+    :param dry_run: Только посчитать изменения и собрать предпросмотр, ничего не записывая
+    :param on_chunk: Вызывается внутри транзакции пачки с исходными строками пачки
+        и stats после неё: так фоновая задача сохраняет чекпоинт атомарно с данными
+    """
+
+    def __init__(self, model, category_model, tag_model, cache_namespaces,
+                 unique_names=False, chunk_size=DEFAULT_CHUNK_SIZE, skip_unchanged=False, dry_run=False,
+                 on_chunk=None):
+        self.model = model
+        self.category_model = category_model
+        self.tag_model = tag_model
+        self.cache_namespaces = cache_namespaces
+        self.unique_names = unique_names
+        self.chunk_size = chunk_size
+        self.skip_unchanged = skip_unchanged
+        self.dry_run = dry_run
+        self.on_chunk = on_chunk
+        if tag_model is not None:
+            tags_field = model._meta.get_field('tags')
+            self.through = tags_field.remote_field.through
+            self.through_source = tags_field.m2m_field_name() + '_id'
+            self.through_target = tags_field.m2m_reverse_field_name() + '_id'
+        self.stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'errors': []}
+        self.preview = []
+        self.name_resolver = UniqueValueResolver(model, 'name')
+        self.slug_resolver = UniqueValueResolver(model, 'slug')
+        self._explicit_ids = False
+        # Страницы карты сайта с записанными строками (None — id неизвестен)
+        self.sitemap_pages = set()
+
+    # Подготовка строк
+
+    def clean_row(self, row):
+        name = row.get('name') or row.get('h1')
+        if is_missing(name) or not str(name).strip():
+            raise ValidationError("Не заполнено имя (name/h1)")
+
+        values = {}
+        for field_name in IMPORT_FIELDS:
+            value = row.get(field_name)
+            if field_name == 'name':
+                value = name
+            field = self.model._meta.get_field(field_name)
+            values[field_name] = None if is_missing(value) else field.to_python(value)
+        if values['content'] is None and not self.model._meta.get_field('content').null:
+            values['content'] = ''
+
+        row_id = row.get('id')
+        # category — Excel/Google Sheets, category_name — SQLite, category__name — наш экспорт
+        category_name = row.get('category') or row.get('category_name') or row.get('category__name')
+        cleaned = {
+            'id': None if is_missing(row_id) else int(row_id),
+            'values': values,
+            'category': None if is_missing(category_name) else str(category_name).strip(),
+            'category_defaults': {
+                key: row.get(f'category_{key}') for key in ('title', 'h1', 'description')
+                if not is_missing(row.get(f'category_{key}'))
+            },
+            'tags': split_tags(row.get('tags')),
+        }
+        cleaned['fingerprint'] = row_fingerprint(cleaned)
+        return cleaned
+
+    # Категории и теги
+
+    def resolve_categories(self, rows):
+        names = {row['category'] for row in rows if row['category']}
+        if self.category_model is None or not names:
+            return {}
+        categories = {c.name: c for c in self.category_model.objects.filter(name__in=names)}
+        missing = names - categories.keys()
+        if missing:
+            defaults = {row['category']: row['category_defaults'] for row in rows if row['category'] in missing}
+            self.category_model.objects.bulk_create([
+                self.category_model(
+                    name=name,
+                    slug=transliterate(name),
+                    title=defaults[name].get('title', name),
+                    h1=defaults[name].get('h1', name),
+                    description=defaults[name].get('description', name),
+                )
+                for name in missing
+            ], ignore_conflicts=True)
+            categories.update({c.name: c for c in self.category_model.objects.filter(name__in=missing)})
+        return categories
+
+    def resolve_tags(self, rows):
+        names_by_slug = {}
+        for row in rows:
+            for name in row['tags']:
+                names_by_slug.setdefault(transliterate(name), name)
+        if self.tag_model is None or not names_by_slug:
+            return {}
+        tags = {t.slug: t for t in self.tag_model.objects.filter(slug__in=names_by_slug.keys())}
+        missing = names_by_slug.keys() - tags.keys()
+        if missing:
+            self.tag_model.objects.bulk_create([
+                self.tag_model(name=names_by_slug[slug], slug=slug) for slug in missing
+            ], ignore_conflicts=True)
+            tags.update({t.slug: t for t in self.tag_model.objects.filter(slug__in=missing)})
+        return tags
+
+    # Посты
+
+    def build_objects(self, rows, categories, existing_ids):
+        new_rows = [row for row in rows if row['id'] not in existing_ids]
+        if self.unique_names:
+            # Занятые имена и slug для всей пачки загружаются двумя-четырьмя запросами
+            self.name_resolver.load(row['values']['name'] for row in new_rows)
+            self.slug_resolver.load(transliterate(row['values']['name']) for row in new_rows)
+
+        objects = []
+        for row in rows:
+            values = dict(row['values'])
+            if row['id'] not in existing_ids:
+                if self.unique_names:
+                    values['slug'] = self.slug_resolver.resolve(transliterate(values['name']))
+                    values['name'] = self.name_resolver.resolve(values['name'])
+                else:
+                    values['slug'] = transliterate(values['name'])
+            obj = self.model(id=row['id'], category=categories.get(row['category']), **values)
+            obj.import_fingerprint = row['fingerprint']
+            # bulk_create не вызывает save(), поэтому производные поля считаем здесь
+            obj.content_html = render_markdown(obj.content)
+            obj.excerpt = build_excerpt(obj.content, obj.content_html)
+            objects.append(obj)
+        return objects
+
+    def save_objects(self, objects):
+        with_id = [obj for obj in objects if obj.pk is not None]
+        without_id = [obj for obj in objects if obj.pk is None]
+        update_fields = IMPORT_FIELDS + ['category', 'content_html', 'excerpt', 'import_fingerprint']
+        if with_id:
+            # Существующие записи обновляются, slug у них сохраняется прежний
+            self.model.objects.bulk_create(
+                with_id, update_conflicts=True, unique_fields=['id'], update_fields=update_fields
+            )
+            self._explicit_ids = True
+        if without_id:
+            self.model.objects.bulk_create(without_id)
+
+    def save_tags(self, rows, objects, tags):
+        post_ids = [obj.pk for obj in objects]
+        self.through.objects.filter(**{f'{self.through_source}__in': post_ids}).delete()
+        links = []
+        for row, obj in zip(rows, objects):
+            tag_ids = {tags[transliterate(name)].pk for name in row['tags'] if transliterate(name) in tags}
+            links.extend(
+                self.through(**{self.through_source: obj.pk, self.through_target: tag_id})
+                for tag_id in tag_ids
+            )
+        self.through.objects.bulk_create(links, ignore_conflicts=True)
+
+    # Запуск
+
+    def match_existing(self, rows):
+        """
+        Сохранённые хэши записей, которые обновит пачка: {pk: import_fingerprint}.
+        В режиме сравнения строкам без id проставляется id записи с тем же name.
+        """
+        ids = [row['id'] for row in rows if row['id'] is not None]
+        existing = dict(self.model.objects.filter(pk__in=ids).values_list('pk', 'import_fingerprint'))
+        if self.skip_unchanged:
+            names = {row['values']['name'] for row in rows if row['id'] is None}
+            by_name = {}
+            for pk, name, fingerprint in self.model.objects.filter(name__in=names).values_list(
+                    'pk', 'name', 'import_fingerprint'):
+                existing[pk] = fingerprint
+                by_name[name] = pk
+            for row in rows:
+                if row['id'] is None:
+                    row['id'] = by_name.get(row['values']['name'])
+        return existing
+
+    def drop_duplicates(self, rows, stats):
+        # Две строки с одним id в одном upsert PostgreSQL не принимает: остаётся последняя
+        last = {row['id']: index for index, row in enumerate(rows) if row['id'] is not None}
+        unique = []
+        for index, row in enumerate(rows):
+            if row['id'] is None or last[row['id']] == index:
+                unique.append(row)
+            else:
+                stats['skipped'] += 1
+                stats['errors'].append(f"{row['id']}: повторяется в файле, используется последняя строка")
+        return unique
+
+    def add_preview(self, rows, existing):
+        for row in rows:
+            if len(self.preview) >= PREVIEW_LIMIT:
+                return
+            self.preview.append({
+                'action': 'update' if row['id'] in existing else 'insert',
+                'id': row['id'],
+                'name': row['values']['name'],
+            })
+
+    def save_chunk(self, rows, raw_rows):
+        stats = dict(self.stats, errors=list(self.stats['errors']))
+        with transaction.atomic():
+            existing = self.match_existing(rows)
+            rows = self.drop_duplicates(rows, stats)
+            if self.skip_unchanged:
+                changed = [row for row in rows if existing.get(row['id']) != row['fingerprint']]
+                stats['unchanged'] += len(rows) - len(changed)
+                rows = changed
+            if self.dry_run:
+                self.add_preview(rows, existing)
+            elif rows:
+                categories = self.resolve_categories(rows)
+                tags = self.resolve_tags(rows)
+                objects = self.build_objects(rows, categories, existing.keys())
+                self.save_objects(objects)
+                self.sitemap_pages.update(sitemap_page_for_id(obj.pk) if obj.pk else None for obj in objects)
+                if self.tag_model is not None:
+                    self.save_tags(rows, objects, tags)
+                update_search_vectors(self.model, [obj.pk for obj in objects])
+
+            updated = sum(1 for row in rows if row['id'] in existing)
+            stats['updated'] += updated
+            stats['created'] += len(rows) - updated
+            if self.on_chunk is not None:
+                self.on_chunk(raw_rows, stats)
+        self.stats = stats
+
+    def import_chunk(self, raw_rows):
+        rows = []
+        for raw_row in raw_rows:
+            try:
+                rows.append(self.clean_row(raw_row))
+            except (ValidationError, TypeError, ValueError) as e:
+                self.stats['skipped'] += 1
+                self.stats['errors'].append(f"{raw_row.get('id')}: {e}")
+
+        try:
+            self.save_chunk(rows, raw_rows)
+        except IntegrityError:
+            if not self.unique_names:
+                raise
+            # Имя или slug успел занять параллельный импорт: перечитываем занятые
+            # значения из БД и повторяем пачку один раз
+            self.name_resolver.reset()
+            self.slug_resolver.reset()
+            self.save_chunk(rows, raw_rows)
+
+    def reset_sequence(self):
+        # После вставки с явными id последовательность PostgreSQL нужно сдвинуть
+        statements = connection.ops.sequence_reset_sql(no_style(), [self.model])
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+    def rebuild_sitemaps(self):
+        # Новые категории могли появиться в любой пачке, их раздел небольшой
+        schedule_sitemap_section_rebuild(self.category_model)
+        if None in self.sitemap_pages:
+            schedule_sitemap_section_rebuild(self.model)
+        else:
+            schedule_sitemap_pages_rebuild(self.model, self.sitemap_pages)
+
+    def run(self, rows):
+        with defer_cache_invalidation():
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= self.chunk_size:
+                    self.import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk)
+
+            if self._explicit_ids:
+                self.reset_sequence()
+
+            # Сигналы при массовых операциях не срабатывают — сбрасываем кэш один раз,
+            # и только если что-то действительно записано
+            if not self.dry_run and (self.stats['created'] or self.stats['updated']):
+                for namespace in self.cache_namespaces:
+                    bump_cache_version(namespace)
+                self.rebuild_sitemaps()
+        return self.stats
+
+
+def post_importer(**kwargs):
+    return BulkImporter(Post, Category, Tag, [BLOG_NAMESPACE, CATEGORY_TAGS_NAMESPACE], unique_names=True, **kwargs)
+
+
+def article_importer(**kwargs):
+    # Категории статей с числом статей выводятся и в общем сайдбаре работ
+    return BulkImporter(ArticlePost, ArticleCategory, ArticleTag, [ARTICLES_NAMESPACE, BLOG_NAMESPACE], unique_names=True, **kwargs)
+
+
+def format_import_stats(stats):
+    message = (
+        f"Добавлено: {stats['created']}, обновлено: {stats['updated']}, "
+        f"без изменений: {stats['unchanged']}, пропущено: {stats['skipped']}"
+    )
+    if stats['errors']:
+        message += ". Ошибки: " + '; '.join(stats['errors'][:10])
+    return message
@@ -0,0 +1,303 @@
+# blog/jobs.py
+
+import datetime
+import os
+import socket
+import sqlite3
+import tempfile
+import traceback
+import pandas as pd
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from blog.models import Job, Post, ArticlePost, Tag, Category
+from blog.importers import post_importer, article_importer, dataframe_rows, sqlite_rows
+from blog.sitemaps import build_sitemap_page, build_sitemap_section, build_sitemap_index
+from blog.exporters import (
+    iter_export_rows, write_excel, write_csv, write_sqlite,
+    POST_EXPORT_FIELDS, POST_SQLITE_COLUMNS, TAXONOMY_EXPORT_FIELDS, TAXONOMY_SQLITE_COLUMNS
+)
+
+# Как часто (в строках) экспорт записывает прогресс в БД
+EXPORT_PROGRESS_EVERY = 1000
+
+# Сколько ошибок по строкам сохраняется в задаче
+MAX_JOB_ERRORS = 100
+
+# Задача в статусе «выполняется» без отчётов о прогрессе дольше этого времени
+# считается брошенной (воркер упал) и возвращается в очередь
+STALE_JOB_TIMEOUT = datetime.timedelta(minutes=15)
+
+# Ключ с позицией строки в источнике, по которой сохраняется чекпоинт
+SOURCE_POSITION = '_source_position'
+
+# Импорт в фоне: посты и статьи (теги и категории импортируются сразу, они небольшие)
+IMPORTERS = {
+    'post': post_importer,
+    'article': article_importer,
+}
+
+# Таблица в SQLite-файле, из которой читается импорт
+SQLITE_IMPORT_TABLES = {
+    'post': 'parsed_essays',
+    'article': 'parsed_articles',
+}
+
+# Экспорт: модель, поля, нужна ли колонка тегов, таблица и колонки SQLite, имя файла
+EXPORTS = {
+    'post': (Post, POST_EXPORT_FIELDS, True, 'parsed_essays', POST_SQLITE_COLUMNS, 'posts'),
+    'article': (ArticlePost, POST_EXPORT_FIELDS, True, 'parsed_articles', POST_SQLITE_COLUMNS, 'articleposts'),
+    'tag': (Tag, TAXONOMY_EXPORT_FIELDS, False, 'parsed_tags', TAXONOMY_SQLITE_COLUMNS, 'tags'),
+    'category': (Category, TAXONOMY_EXPORT_FIELDS, False, 'parsed_categories', TAXONOMY_SQLITE_COLUMNS, 'categories'),
+}
+
+EXPORT_EXTENSIONS = {
+    'excel': 'xlsx',
+    'csv': 'csv',
+    'sqlite': 'sqlite',
+}
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# Постановка в очередь
+
+def enqueue_import(target, file_format, uploaded_file, skip_unchanged=False, dry_run=False):
+    """
+    Сохраняет загруженный файл и ставит задачу импорта в очередь.
+    """
+    job = Job(kind=Job.KIND_IMPORT, target=target,
+              params={'format': file_format, 'skip_unchanged': skip_unchanged, 'dry_run': dry_run})
+    job.source_file.save(os.path.basename(uploaded_file.name), uploaded_file, save=False)
+    job.save()
+    return job
+
+
+def enqueue_export(target, export_format):
+    return Job.objects.create(kind=Job.KIND_EXPORT, target=target, params={'format': export_format})
+
+
+def claim_job(worker=None):
+    """
+    Забирает самую старую задачу из очереди. select_for_update(skip_locked=True)
+    не даёт двум воркерам взять одну задачу и не заставляет их ждать друг друга.
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_PENDING)
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.STATUS_RUNNING
+        job.worker = worker or worker_name()
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'worker', 'started_at', 'heartbeat_at'])
+    return job
+
+
+def requeue_stale_jobs(timeout=STALE_JOB_TIMEOUT):
+    """
+    Возвращает в очередь задачи упавших воркеров. Импорт продолжится с чекпоинта.
+    """
+    limit = timezone.now() - timeout
+    return Job.objects.filter(status=Job.STATUS_RUNNING).filter(
+        Q(heartbeat_at__lt=limit) | Q(heartbeat_at__isnull=True, started_at__lt=limit)
+    ).update(status=Job.STATUS_PENDING, worker='')
+
+
+# Прогресс
+
+class JobProgress:
+    """
+    Записывает прогресс задачи UPDATE-ом по pk, не трогая остальные поля.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        # Ошибки прошлых запусков задачи сохраняются при возобновлении
+        self.previous_errors = job.errors
+
+    def save(self, **values):
+        values['heartbeat_at'] = timezone.now()
+        for field, value in values.items():
+            setattr(self.job, field, value)
+        Job.objects.filter(pk=self.job.pk).update(**values)
+
+    def set_total(self, total):
+        self.save(total_rows=total)
+
+    def update(self, processed):
+        self.save(processed_rows=processed)
+
+    def update_from_stats(self, stats, **values):
+        values.update(
+            processed_rows=stats['created'] + stats['updated'] + stats['unchanged'] + stats['skipped'],
+            created_rows=stats['created'],
+            updated_rows=stats['updated'],
+            unchanged_rows=stats['unchanged'],
+            skipped_rows=stats['skipped'],
+        )
+        if stats['errors']:
+            errors = ([self.previous_errors] if self.previous_errors else []) + stats['errors']
+            values['errors'] = '\n'.join(errors[:MAX_JOB_ERRORS])
+        self.save(**values)
+
+    def checkpoint(self, raw_rows, stats):
+        # Вызывается внутри транзакции пачки: чекпоинт и данные фиксируются вместе
+        self.update_from_stats(stats, checkpoint=raw_rows[-1][SOURCE_POSITION])
+
+
+# Импорт
+
+def sqlite_import_rows(path, table_name, after=0):
+    """
+    Строки таблицы SQLite по порядку rowid, начиная после чекпоинта.
+    """
+    return sqlite_rows(
+        path, f'SELECT rowid AS {SOURCE_POSITION}, * FROM {table_name} WHERE rowid > ? ORDER BY rowid', (after,)
+    )
+
+
+def sqlite_count(path, table_name):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table_name}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def excel_import_rows(df, after=0):
+    # Позиция строки Excel — её номер среди строк данных, начиная с 1
+    for position, row in enumerate(dataframe_rows(df.iloc[after:]), start=after + 1):
+        row[SOURCE_POSITION] = position
+        yield row
+
+
+def run_import(job, progress):
+    file_format = job.params.get('format')
+    path = job.source_file.path
+    if file_format == 'excel':
+        df = pd.read_excel(path)
+        progress.set_total(len(df))
+        rows = excel_import_rows(df, after=job.checkpoint)
+    elif file_format == 'sqlite':
+        table_name = SQLITE_IMPORT_TABLES[job.target]
+        progress.set_total(sqlite_count(path, table_name))
+        rows = sqlite_import_rows(path, table_name, after=job.checkpoint)
+    else:
+        raise ValueError(f"Неизвестный формат импорта: {file_format}")
+
+    importer = IMPORTERS[job.target](
+        skip_unchanged=job.params.get('skip_unchanged', False),
+        dry_run=job.params.get('dry_run', False),
+        on_chunk=progress.checkpoint,
+    )
+    # Возобновлённая задача продолжает счётчики с места остановки
+    importer.stats.update(
+        created=job.created_rows, updated=job.updated_rows,
+        unchanged=job.unchanged_rows, skipped=job.skipped_rows,
+    )
+    importer.preview = list(job.preview)
+    importer.run(rows)
+    if importer.dry_run:
+        progress.save(preview=importer.preview)
+
+
+# Экспорт
+
+def counted(rows, progress, every=EXPORT_PROGRESS_EVERY):
+    processed = 0
+    for row in rows:
+        yield row
+        processed += 1
+        if processed % every == 0:
+            progress.update(processed)
+    progress.update(processed)
+
+
+def run_export(job, progress):
+    export_format = job.params.get('format')
+    if export_format not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Неизвестный формат экспорта: {export_format}")
+    model, fields, with_tags, table_name, sqlite_columns, basename = EXPORTS[job.target]
+    queryset = model.objects.all()
+    progress.set_total(queryset.count())
+    rows = counted(iter_export_rows(queryset, fields, with_tags=with_tags), progress)
+    header = fields + (['tags'] if with_tags else [])
+
+    fd, path = tempfile.mkstemp(suffix=f'.{EXPORT_EXTENSIONS[export_format]}')
+    os.close(fd)
+    try:
+        if export_format == 'excel':
+            with open(path, 'wb') as output:
+                write_excel(header, rows, output)
+        elif export_format == 'csv':
+            with open(path, 'w', encoding='utf-8', newline='') as output:
+                write_csv(header, rows, output)
+        else:
+            os.remove(path)  # SQLite создаёт файл сам
+            write_sqlite(table_name, sqlite_columns, rows, path)
+
+        filename = f'{basename}_{job.pk}.{EXPORT_EXTENSIONS[export_format]}'
+        with open(path, 'rb') as result:
+            job.result_file.save(filename, File(result), save=False)
+        Job.objects.filter(pk=job.pk).update(result_file=job.result_file.name)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Карта сайта
+
+def run_sitemap(job, progress):
+    # Страницы, отмеченные сохранениями записей; None — весь раздел.
+    # Прогресс считается в страницах (разделах) карты
+    sections = job.params.get('sections', {})
+    progress.set_total(sum(len(pages) if pages is not None else 1 for pages in sections.values()))
+    processed = 0
+    for section, pages in sections.items():
+        if pages is None:
+            build_sitemap_section(section)
+            processed += 1
+        else:
+            for page in pages:
+                build_sitemap_page(section, page)
+                processed += 1
+        progress.update(processed)
+    build_sitemap_index()
+
+
+# Запуск
+
+def run_job(job):
+    """
+    Выполняет задачу и записывает итоговый статус. Исключения не пробрасываются:
+    текст ошибки сохраняется в задаче, воркер переходит к следующей.
+    """
+    progress = JobProgress(job)
+    try:
+        if job.kind == Job.KIND_IMPORT:
+            run_import(job, progress)
+        elif job.kind == Job.KIND_SITEMAP:
+            run_sitemap(job, progress)
+        else:
+            run_export(job, progress)
+    except Exception:
+        job.status = Job.STATUS_FAILED
+        job.errors = (job.errors + '\n' if job.errors else '') + traceback.format_exc()
+        Job.objects.filter(pk=job.pk).update(status=job.status, errors=job.errors, finished_at=timezone.now())
+    else:
+        job.status = Job.STATUS_DONE
+        Job.objects.filter(pk=job.pk).update(status=job.status, finished_at=timezone.now())
+        if job.source_file:
+            # Исходный файл больше не нужен
+            job.source_file.delete(save=False)
+            Job.objects.filter(pk=job.pk).update(source_file='')
+    job.refresh_from_db()
+    return job
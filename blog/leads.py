@@ -0,0 +1,117 @@
+# blog/leads.py
+
+import datetime
+import random
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from blog.models import OutboundLead
+
+# Таймауты запроса к партнёру: (соединение, ответ), секунды
+DELIVERY_TIMEOUT = (3.05, 10)
+
+# Сколько заявок воркер забирает за раз
+DELIVERY_BATCH_SIZE = 20
+
+# На сколько заявка скрывается от других воркеров, пока её отправляют.
+# Если воркер упал посреди отправки, заявку возьмут снова после этого времени
+DELIVERY_LEASE = datetime.timedelta(minutes=5)
+
+# После стольких неудачных попыток заявка считается недоставленной (dead)
+MAX_DELIVERY_ATTEMPTS = 8
+
+# Пауза перед повтором растёт вдвое с каждой попыткой: 30 с, 1 мин, 2 мин ... но не больше 6 ч
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 6 * 60 * 60
+
+# Ответы, после которых повтор имеет смысл; остальные 4xx означают, что заявку
+# партнёр не примет никогда
+RETRYABLE_STATUSES = {408, 425, 429}
+
+
+def enqueue_lead(data):
+    return OutboundLead.objects.create(payload=data)
+
+
+def make_session(pool_size=DELIVERY_BATCH_SIZE):
+    """
+    Сессия с пулом соединений: заявки одной пачки идут по уже открытому
+    keep-alive соединению, без нового TCP/TLS-рукопожатия на каждую.
+    Повторы делает очередь, поэтому встроенные повторы urllib3 выключены.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def retry_delay(attempts):
+    # Экспоненциальная пауза со случайным разбросом, чтобы повторы не шли одной волной
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return datetime.timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_leads(limit=DELIVERY_BATCH_SIZE):
+    """
+    Забирает заявки, которые пора отправить. select_for_update(skip_locked=True)
+    не даёт двум воркерам взять одну заявку, а сдвиг next_attempt_at на время
+    отправки прячет её от остальных после выхода из транзакции.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        leads = list(
+            OutboundLead.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[OutboundLead.STATUS_PENDING, OutboundLead.STATUS_FAILED], next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:limit]
+        )
+        if leads:
+            OutboundLead.objects.filter(pk__in=[lead.pk for lead in leads]).update(
+                next_attempt_at=now + DELIVERY_LEASE
+            )
+    return leads
+
+
+def deliver_lead(session, lead, url=None, timeout=DELIVERY_TIMEOUT, max_attempts=MAX_DELIVERY_ATTEMPTS):
+    """
+    Отправляет заявку и записывает результат. Возвращает новый статус заявки.
+    """
+    lead.attempts += 1
+    lead.response_status = None
+    try:
+        response = session.post(url or settings.PARTNER_ORDER_URL, data=lead.payload, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        lead.last_error = str(e)
+        permanent = False
+    else:
+        lead.response_status = response.status_code
+        if response.status_code == 200:
+            lead.status = OutboundLead.STATUS_SENT
+            lead.sent_at = timezone.now()
+            lead.last_error = ''
+            return save_delivery(lead)
+        lead.last_error = f"HTTP {response.status_code}: {response.text[:500]}"
+        permanent = 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES
+
+    if permanent or lead.attempts >= max_attempts:
+        lead.status = OutboundLead.STATUS_DEAD
+    else:
+        lead.status = OutboundLead.STATUS_FAILED
+        lead.next_attempt_at = timezone.now() + retry_delay(lead.attempts)
+    return save_delivery(lead)
+
+
+def save_delivery(lead):
+    lead.save(update_fields=['status', 'attempts', 'next_attempt_at', 'response_status', 'last_error', 'sent_at'])
+    return lead.status
+
+
+def requeue_dead_leads(queryset):
+    """
+    Возвращает недоставленные заявки в очередь с нуля (например, после исправления адреса партнёра).
+    """
+    return queryset.filter(status__in=[OutboundLead.STATUS_DEAD, OutboundLead.STATUS_FAILED]).update(
+        status=OutboundLead.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now(), last_error=''
+    )
@@ -0,0 +1,49 @@
+# blog/management/commands/backfill_excerpts.py
+
+from django.core.management.base import BaseCommand
+from blog.models import Post, ArticlePost
+from blog.utils import render_markdown, build_excerpt
+from blog.cache_utils import bump_cache_version, BLOG_NAMESPACE, ARTICLES_NAMESPACE
+
+MODELS = {
+    'post': (Post, BLOG_NAMESPACE),
+    'articlepost': (ArticlePost, ARTICLES_NAMESPACE),
+}
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает анонсы (excerpt) для списков постов и статей пачками"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append',
+                            help="Модель для пересчёта (по умолчанию все)")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--only-missing', action='store_true',
+                            help="Обрабатывать только записи с пустым excerpt")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for key in options['model'] or sorted(MODELS):
+            model, namespace = MODELS[key]
+            queryset = model.objects.only('id', 'content', 'content_html', 'excerpt').order_by('id')
+            if options['only_missing']:
+                queryset = queryset.filter(excerpt='')
+
+            batch = []
+            total = 0
+            for obj in queryset.iterator(chunk_size=batch_size):
+                # content_html может быть ещё не заполнен у старых записей
+                obj.excerpt = build_excerpt(obj.content, obj.content_html or render_markdown(obj.content))
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, ['excerpt'])
+                    total += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, ['excerpt'])
+                total += len(batch)
+
+            # bulk_update не отправляет сигналы: закэшированные списки сбрасываем сами
+            if total:
+                bump_cache_version(namespace)
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: обновлено {total} записей"))
@@ -0,0 +1,49 @@
+# blog/management/commands/benchmark_category_listing.py
+
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from blog.models import Category
+from blog.views import category_detail
+
+
+class Command(BaseCommand):
+    help = "Замеряет число запросов, время и пик памяти страницы категории в зависимости от её размера"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=5,
+                            help="Сколько категорий разного размера замерить")
+        parser.add_argument('--page', type=int, default=1)
+
+    def handle(self, *args, **options):
+        categories = list(
+            Category.objects.annotate(post_total=Count('posts')).order_by('-post_total')
+        )
+        if not categories:
+            self.stdout.write("Нет категорий для замера")
+            return
+
+        # Берём категории равномерно от самой большой до самой маленькой
+        step = max(1, len(categories) // options['categories'])
+        sample = categories[::step][:options['categories']]
+
+        factory = RequestFactory()
+        self.stdout.write(f"{'постов':>10} {'запросов':>10} {'мс':>10} {'пик, КБ':>10}  категория")
+        for category in sample:
+            request = factory.get(f'/category/{category.slug}/', {'page': options['page']})
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                category_detail(request, category.slug)
+            elapsed = (time.perf_counter() - started) * 1000
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f"{category.post_total:>10} {len(queries):>10} {elapsed:>10.1f} {peak / 1024:>10.0f}  {category.slug}"
+            )
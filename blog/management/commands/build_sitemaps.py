@@ -0,0 +1,24 @@
+# blog/management/commands/build_sitemaps.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from blog.sitemaps import SITEMAP_SECTIONS, build_sitemap_section, build_sitemap_index
+
+
+class Command(BaseCommand):
+    help = ("Собирает карту сайта в файлы sitemap-*.xml.gz (SITEMAP_ROOT). После первой сборки "
+            "изменённые страницы пересобирает воркер run_jobs")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', choices=sorted(SITEMAP_SECTIONS), action='append',
+                            help="Раздел для пересборки (по умолчанию все)")
+        parser.add_argument('--base-url', default=settings.SITEMAP_BASE_URL,
+                            help="Адрес сайта для ссылок (по умолчанию SITEMAP_BASE_URL)")
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        for section in options['section'] or SITEMAP_SECTIONS:
+            built = build_sitemap_section(section, base_url)
+            self.stdout.write(f"{section}: собрано страниц {built}")
+        build_sitemap_index(base_url)
+        self.stdout.write(self.style.SUCCESS(f"Индекс карты сайта записан в {settings.SITEMAP_ROOT}"))
@@ -0,0 +1,44 @@
+# blog/management/commands/deliver_leads.py
+
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from blog.leads import claim_leads, deliver_lead, make_session, DELIVERY_BATCH_SIZE
+from blog.models import OutboundLead
+
+
+class Command(BaseCommand):
+    help = "Отправляет партнёру заявки из формы заказа: повторяет неудачные с нарастающей паузой"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Отправить заявки, которые уже пора отправлять, и завершиться")
+        parser.add_argument('--sleep', type=float, default=5.0,
+                            help="Пауза между проверками пустой очереди, секунды")
+        parser.add_argument('--batch-size', type=int, default=DELIVERY_BATCH_SIZE)
+        parser.add_argument('--url', default=settings.PARTNER_ORDER_URL,
+                            help="Адрес приёма заявок (по умолчанию PARTNER_ORDER_URL)")
+
+    def handle(self, *args, **options):
+        session = make_session(options['batch_size'])
+        try:
+            while True:
+                close_old_connections()
+                leads = claim_leads(options['batch_size'])
+                if not leads:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                for lead in leads:
+                    status = deliver_lead(session, lead, url=options['url'])
+                    if status == OutboundLead.STATUS_SENT:
+                        self.stdout.write(self.style.SUCCESS(f"{lead}: отправлена"))
+                    else:
+                        style = self.style.ERROR if status == OutboundLead.STATUS_DEAD else self.style.WARNING
+                        self.stdout.write(style(f"{lead}: {lead.get_status_display()}, попытка {lead.attempts}: "
+                                                f"{lead.last_error}"))
+        finally:
+            session.close()
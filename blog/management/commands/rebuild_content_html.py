@@ -0,0 +1,55 @@
+# blog/management/commands/rebuild_content_html.py
+
+from django.core.management.base import BaseCommand
+from blog.models import Post, ArticlePost, StaticPage
+from blog.utils import render_markdown, build_excerpt
+from blog.cache_utils import bump_cache_version, BLOG_NAMESPACE, ARTICLES_NAMESPACE
+
+MODELS = {
+    'post': (Post, BLOG_NAMESPACE),
+    'articlepost': (ArticlePost, ARTICLES_NAMESPACE),
+    'staticpage': (StaticPage, BLOG_NAMESPACE),
+}
+
+
+class Command(BaseCommand):
+    help = "Перестраивает сохранённый HTML (content_html) из markdown-контента, а у постов и статей и анонс (excerpt)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append',
+                            help="Модель для перестроения (по умолчанию все)")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--only-missing', action='store_true',
+                            help="Обрабатывать только записи с пустым content_html")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for key in options['model'] or sorted(MODELS):
+            model, namespace = MODELS[key]
+            # Анонс строится в том числе из content_html, поэтому пересчитывается вместе с ним
+            fields = ['content_html']
+            if any(field.name == 'excerpt' for field in model._meta.fields):
+                fields.append('excerpt')
+            queryset = model.objects.only('id', 'content', *fields).order_by('id')
+            if options['only_missing']:
+                queryset = queryset.filter(content_html='')
+
+            batch = []
+            total = 0
+            for obj in queryset.iterator(chunk_size=batch_size):
+                obj.content_html = render_markdown(obj.content)
+                if 'excerpt' in fields:
+                    obj.excerpt = build_excerpt(obj.content, obj.content_html)
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    model.objects.bulk_update(batch, fields)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, fields)
+                total += len(batch)
+
+            # bulk_update не отправляет сигналы: закэшированные страницы сбрасываем сами
+            if total:
+                bump_cache_version(namespace)
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: обновлено {total} записей"))
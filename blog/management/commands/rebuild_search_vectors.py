@@ -0,0 +1,32 @@
+# blog/management/commands/rebuild_search_vectors.py
+
+from django.core.management.base import BaseCommand, CommandError
+from blog.models import Post, ArticlePost
+from blog.search import is_postgresql, update_search_vectors
+
+MODELS = {
+    'post': Post,
+    'articlepost': ArticlePost,
+}
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает полнотекстовые индексы (search_vector) постов и статей пачками"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), action='append',
+                            help="Модель для пересчёта (по умолчанию все)")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not is_postgresql():
+            raise CommandError("Полнотекстовый поиск доступен только на PostgreSQL")
+
+        batch_size = options['batch_size']
+        for key in options['model'] or sorted(MODELS):
+            model = MODELS[key]
+            ids = list(model.objects.order_by('id').values_list('id', flat=True))
+            total = 0
+            for start in range(0, len(ids), batch_size):
+                total += update_search_vectors(model, ids[start:start + batch_size])
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: обновлено {total} записей"))
@@ -0,0 +1,16 @@
+# blog/management/commands/recalculate_ratings.py
+
+from django.core.management.base import BaseCommand
+from blog.models import recalculate_post_ratings
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сохранённые рейтинги постов (rating_sum/rating_count) по одобренным комментариям"
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_ids', nargs='*', type=int,
+                            help="Идентификаторы постов (по умолчанию все)")
+
+    def handle(self, *args, **options):
+        updated = recalculate_post_ratings(options['post_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Обновлено постов: {updated}"))
@@ -0,0 +1,45 @@
+# blog/management/commands/run_jobs.py
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from blog.jobs import claim_job, run_job, requeue_stale_jobs, worker_name
+
+
+class Command(BaseCommand):
+    help = "Воркер фоновых задач импорта/экспорта: берёт задачи из очереди в БД и выполняет их"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Выполнить задачи, которые уже в очереди, и завершиться")
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help="Пауза между проверками пустой очереди, секунды")
+        parser.add_argument('--max-jobs', type=int, default=0,
+                            help="Завершиться после стольких задач (0 — без ограничения)")
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        done = 0
+        self.stdout.write(f"Воркер {worker} запущен")
+        while True:
+            close_old_connections()
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"Возвращено в очередь зависших задач: {requeued}")
+            job = claim_job(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f"{job}: выполняется")
+            job = run_job(job)
+            style = self.style.SUCCESS if job.status == job.STATUS_DONE else self.style.ERROR
+            self.stdout.write(style(
+                f"{job}: {job.get_status_display()}, строк {job.processed_rows}, {job.rows_per_second()} строк/с"
+            ))
+
+            done += 1
+            if options['max_jobs'] and done >= options['max_jobs']:
+                break
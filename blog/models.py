@@ -1,9 +1,17 @@
 import re
-from django.db import models
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from unidecode import unidecode
 from django_ckeditor_5.fields import CKEditor5Field
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.urls import reverse
+from django.utils import timezone
+from blog.utils import render_markdown, build_excerpt
 
 # Функция транслитерации
 def transliterate(value):
@@ -75,6 +83,8 @@ class Post(models.Model):
     title = models.CharField(max_length=2000)
     h1 = models.CharField(max_length=2000, blank=True, null=True)
     content = CKEditor5Field('Content', config_name='extends', blank=True, null=True)  # Используем CKEditor5Field для редактирования контента
+    content_html = models.TextField(blank=True, default='', editable=False)  # HTML, отрендеренный из content при сохранении
+    excerpt = models.TextField(blank=True, default='', editable=False)  # Короткий анонс для списков, считается при сохранении
     created_at = models.DateTimeField(auto_now_add=True)
     slug = models.SlugField(unique=True, max_length=2550, blank=True)
     category = models.ForeignKey(Category, related_name='posts', on_delete=models.CASCADE, null=True)
@@ -88,19 +98,35 @@ class Post(models.Model):
     sources = models.IntegerField(blank=True, null=True)  # Поле для источников
     price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # Поле для цены
 
+    # Агрегаты по одобренным комментариям, поддерживаются сигналами комментариев
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)  # Полнотекстовый индекс, обновляется сигналами
+    import_fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False)  # Хэш строки последнего импорта
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем категорию на момент загрузки, чтобы при её смене сбросить кэш старой категории
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = transliterate(self.name)
+        self.content_html = render_markdown(self.content)
+        self.excerpt = build_excerpt(self.content, self.content_html)
+        # Правка вне импорта: следующий импорт должен перезаписать запись, даже если строка не менялась
+        self.import_fingerprint = ''
         super().save(*args, **kwargs)
 
     def average_rating(self):
-        comments = self.comments.filter(approved=True)
-        if comments:
-            return sum(comment.rating for comment in comments) / len(comments)
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
         return 0
 
     def get_similar_posts(self):
-        return Post.objects.filter(category=self.category).exclude(id=self.id)[:6]
+        return Post.objects.filter(category=self.category).exclude(id=self.id).defer('content', 'content_html')[:6]
 
     def get_absolute_url(self):
         return reverse('post_detail', args=[self.slug])
@@ -111,6 +137,12 @@ class Post(models.Model):
     class Meta:
         verbose_name = "Работы"
         verbose_name_plural = "Работы"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+            # Постраничный вывод по ключу (created_at, id), см. blog/pagination.py
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='post_category_created_id_idx'),
+        ]
 
 # Модель для статических страниц
 class StaticPage(models.Model):
@@ -118,12 +150,14 @@ class StaticPage(models.Model):
     h1 = models.CharField(max_length=2000, blank=True, null=True)
     slug = models.SlugField(unique=True, max_length=2505)
     content = CKEditor5Field('Content', config_name='extends', blank=True, null=True)  # Используем CKEditor5Field
+    content_html = models.TextField(blank=True, default='', editable=False)  # HTML, отрендеренный из content при сохранении
     show_in_footer = models.BooleanField(default=False)
     show_in_header = models.BooleanField(default=False)
 
     def save(self, *args, **kwargs):
         if not self.slug or self.slug != transliterate(self.title):
             self.slug = transliterate(self.title)
+        self.content_html = render_markdown(self.content)
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -147,6 +181,24 @@ class Comment(models.Model):
     approved = models.BooleanField(default=False)
     rating = models.IntegerField(default=0)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Состояние на момент загрузки нужно, чтобы пересчитать рейтинг поста по разнице
+        instance._loaded_rating_state = instance.rating_state()
+        return instance
+
+    def rating_state(self):
+        # (post_id, рейтинг) если комментарий учитывается в рейтинге поста, иначе None
+        if self.approved and self.post_id:
+            return self.post_id, int(self.rating or 0)
+        return None
+
+    def save(self, *args, **kwargs):
+        # Обновление агрегатов поста (сигнал post_save) идёт в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Comment by {self.name} on {self.post}"
 
@@ -154,6 +206,15 @@ class Comment(models.Model):
         verbose_name = "Комментарии"
         verbose_name_plural = "Комментарии"
 
+# Полный пересчёт рейтингов постов по одобренным комментариям одним UPDATE
+def recalculate_post_ratings(post_ids=None):
+    approved = Comment.objects.filter(post=OuterRef('pk'), approved=True).values('post')
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(pk__in=post_ids)
+    return posts.update(
+        rating_sum=Coalesce(Subquery(approved.annotate(total=Sum('rating')).values('total')), Value(0)),
+        rating_count=Coalesce(Subquery(approved.annotate(total=Count('id')).values('total')), Value(0)),
+    )
+
 # Новая модель для тегов статей
 class ArticleTag(models.Model):
     name = models.CharField(max_length=1000, unique=True)
@@ -216,6 +277,8 @@ class ArticlePost(models.Model):
     title = models.CharField(max_length=2000)
     h1 = models.CharField(max_length=2000, blank=True, null=True)
     content = CKEditor5Field('Content', config_name='extends', blank=True)
+    content_html = models.TextField(blank=True, default='', editable=False)  # HTML, отрендеренный из content при сохранении
+    excerpt = models.TextField(blank=True, default='', editable=False)  # Короткий анонс для списков, считается при сохранении
     created_at = models.DateTimeField(auto_now_add=True)
     slug = models.SlugField(unique=True, max_length=2505, blank=True)
     category = models.ForeignKey(ArticleCategory, related_name='articles', on_delete=models.CASCADE, null=True)
@@ -227,12 +290,17 @@ class ArticlePost(models.Model):
     creation_date = models.CharField(max_length=1000, blank=True, null=True)  # Поле для даты создания
     pages = models.CharField(max_length=2000, blank=True, null=True)  # Поле для количества страниц
     sources = models.IntegerField(blank=True, null=True)  # Поле для источников
-    price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # Поле```python
-# для цены
+    price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  # Поле для цены
+    search_vector = SearchVectorField(null=True, editable=False)  # Полнотекстовый индекс, обновляется сигналами
+    import_fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False)  # Хэш строки последнего импорта
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = transliterate(self.name)
+        self.content_html = render_markdown(self.content)
+        self.excerpt = build_excerpt(self.content, self.content_html)
+        # Правка вне импорта: следующий импорт должен перезаписать запись, даже если строка не менялась
+        self.import_fingerprint = ''
         super().save(*args, **kwargs)
 
     def average_rating(self):
@@ -243,7 +311,7 @@ class ArticlePost(models.Model):
         return 0
 
     def get_similar_posts(self):
-        return ArticlePost.objects.filter(category=self.category).exclude(id=self.id)[:6]
+        return ArticlePost.objects.filter(category=self.category).exclude(id=self.id).defer('content', 'content_html')[:6]
 
     def get_absolute_url(self):
         return reverse('article_post_detail', args=[self.slug])
@@ -254,3 +322,128 @@ class ArticlePost(models.Model):
     class Meta:
         verbose_name = "Статьи"
         verbose_name_plural = "Статьи"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='articlepost_search_vector_idx'),
+            # Постраничный вывод по ключу (created_at, id), см. blog/pagination.py
+            models.Index(fields=['-created_at', '-id'], name='article_created_id_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='article_cat_created_id_idx'),
+        ]
+
+
+# Файлы фоновых задач (загруженные источники и готовые выгрузки) лежат вне MEDIA_ROOT:
+# их отдаёт только админка
+def job_files_storage():
+    return FileSystemStorage(location=settings.JOB_FILES_ROOT)
+
+# Фоновая задача импорта, экспорта или пересборки карты сайта: очередь в БД, выполняется командой run_jobs
+class Job(models.Model):
+    KIND_IMPORT = 'import'
+    KIND_EXPORT = 'export'
+    KIND_SITEMAP = 'sitemap'
+    KIND_CHOICES = [
+        (KIND_IMPORT, 'Импорт'),
+        (KIND_EXPORT, 'Экспорт'),
+        (KIND_SITEMAP, 'Пересборка'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    TARGET_SITEMAP = 'sitemap'
+    TARGET_CHOICES = [
+        ('post', 'Работы'),
+        ('article', 'Статьи'),
+        ('tag', 'Теги работ'),
+        ('category', 'Категории'),
+        (TARGET_SITEMAP, 'Карта сайта'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    params = models.JSONField(default=dict, blank=True)  # Формат файла, страницы карты сайта и прочие параметры
+    source_file = models.FileField(upload_to='sources/', storage=job_files_storage, blank=True)
+    result_file = models.FileField(upload_to='results/', storage=job_files_storage, blank=True)
+    total_rows = models.IntegerField(null=True, blank=True)
+    processed_rows = models.IntegerField(default=0)
+    created_rows = models.IntegerField(default=0)
+    updated_rows = models.IntegerField(default=0)
+    unchanged_rows = models.IntegerField(default=0)
+    skipped_rows = models.IntegerField(default=0)
+    # Позиция последней импортированной строки источника (rowid в SQLite, номер строки в Excel):
+    # перезапущенная задача продолжает с неё
+    checkpoint = models.BigIntegerField(default=0)
+    errors = models.TextField(blank=True, default='')
+    preview = models.JSONField(default=list, blank=True)  # Изменения, найденные пробным импортом (dry run)
+    worker = models.CharField(max_length=255, blank=True, default='')  # Кто взял задачу: хост и pid
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Последний отчёт воркера о прогрессе
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def progress_percent(self):
+        if not self.total_rows:
+            return 100 if self.status == self.STATUS_DONE else 0
+        return min(100, round(self.processed_rows * 100 / self.total_rows))
+
+    def rows_per_second(self):
+        if not self.started_at or not self.processed_rows:
+            return 0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.processed_rows / elapsed, 1) if elapsed > 0 else 0
+
+    def __str__(self):
+        dry_run = " (пробный)" if self.params.get('dry_run') else ''
+        return f"{self.get_kind_display()}{dry_run} {self.get_target_display()} #{self.pk}"
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+        ]
+
+
+# Заявка из формы заказа для партнёра: сначала сохраняется в БД, а отправляет её
+# команда deliver_leads, чтобы медленный партнёр не держал воркер сайта
+class OutboundLead(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENT, 'Отправлена'),
+        (STATUS_FAILED, 'Ошибка, будет повтор'),
+        (STATUS_DEAD, 'Не доставлена'),
+    ]
+
+    payload = models.JSONField(default=dict)  # Поля формы в том виде, в каком их ждёт партнёр
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Когда пробовать отправить; на время отправки сдвигается вперёд, чтобы заявку не взял другой воркер
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    response_status = models.PositiveIntegerField(null=True, blank=True)  # HTTP-код последнего ответа
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Заявка #{self.pk} ({self.payload.get('Email') or '—'})"
+
+    class Meta:
+        verbose_name = "Заявка партнёру"
+        verbose_name_plural = "Заявки партнёру"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='lead_status_next_attempt_idx'),
+        ]
@@ -0,0 +1,146 @@
+# blog/pagination.py
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import F, Q, Window
+from django.db.models.functions import Mod, RowNumber
+from django.utils.functional import SimpleLazyObject, cached_property
+from blog.cache_utils import versioned_key, get_or_build, get_or_build_versioned, BLOG_NAMESPACE
+from blog.search import is_postgresql
+
+# Для таблиц больше этого размера число записей без фильтров берётся из статистики
+# планировщика PostgreSQL: точный COUNT(*) по всей таблице дорогой
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+def estimated_count(model):
+    """
+    Оценка числа строк таблицы из pg_class.reltuples (обновляется VACUUM/ANALYZE).
+    None, если оценки нет: не PostgreSQL или таблица ещё не анализировалась.
+    """
+    if not is_postgresql():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator, который не делает COUNT(*) на каждый запрос: число записей хранится
+    в кэше под ключом списка и сбрасывается вместе с версией пространства имён
+    namespace при записи. Для большой таблицы без фильтров берётся оценка
+    планировщика (estimated_count).
+
+    :param object_list: Queryset
+    :param per_page: Записей на странице
+    :param cache_key: Ключ списка в кэше (например, 'category:5'); без него COUNT обычный
+    :param namespace: Пространство имён кэша, версия которого меняется при записи
+    :param count: Заранее известное число записей
+    :param estimate: Разрешить оценку вместо точного числа для таблиц без фильтров
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, namespace=BLOG_NAMESPACE, count=None,
+                 estimate=True, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.namespace = namespace
+        self.estimate = estimate
+        if count is not None:
+            self.count = count
+
+    def build_count(self):
+        query = getattr(self.object_list, 'query', None)
+        if self.estimate and query is not None and not query.where.children:
+            estimate = estimated_count(self.object_list.model)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+    @cached_property
+    def count(self):
+        if not self.cache_key:
+            return self.build_count()
+        return get_or_build_versioned(self.namespace, f'count:{self.cache_key}', self.build_count)
+
+
+def keyset_after(queryset, cursor):
+    """
+    Записи, идущие после cursor = (created_at, id) при сортировке по убыванию.
+    Условие created_at <= X идёт в индекс (created_at, id), остальное — фильтр
+    по нескольким строкам на границе.
+    """
+    created_at, pk = cursor
+    return queryset.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(pk__lt=pk))
+
+
+class KeysetPaginator(CachedCountPaginator):
+    """
+    Paginator, который выбирает страницы по ключу (created_at, id) вместо OFFSET:
+    страница N — это per_page записей после последней записи страницы N-1.
+
+    Ссылки ?page=N продолжают работать: ключи границ всех страниц считаются одним
+    запросом (ROW_NUMBER() по индексу) и хранятся в кэше до изменения данных
+    пространства имён namespace. Поэтому глубокая страница стоит столько же, сколько первая.
+
+    Число записей берётся так же, как в CachedCountPaginator.
+    """
+
+    ordering = ('-created_at', '-id')
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list.order_by(*self.ordering), per_page, **kwargs)
+
+    def build_boundaries(self):
+        # Ключ последней записи каждой полной страницы, по порядку страниц
+        numbered = self.object_list.prefetch_related(None).order_by().annotate(
+            row_number=Window(RowNumber(), order_by=[F('created_at').desc(), F('id').desc()])
+        ).annotate(
+            page_position=Mod(F('row_number'), self.per_page)
+        ).filter(page_position=0).values_list('created_at', 'id')
+        return sorted(numbered, reverse=True)
+
+    def get_boundaries(self):
+        if not self.cache_key:
+            return self.build_boundaries()
+        return get_or_build_versioned(self.namespace, f'page_boundaries:{self.cache_key}:{self.per_page}',
+                                      self.build_boundaries)
+
+    def get_boundary(self, number):
+        """
+        Ключ последней записи страницы number - 1 или None, если его нет.
+        Каждая граница хранится под своим ключом: полный список читается
+        (и при необходимости строится одним запросом) только при промахе.
+        """
+        if not self.cache_key:
+            boundaries = self.build_boundaries()
+            return boundaries[number - 2] if number - 2 < len(boundaries) else None
+
+        def build():
+            boundaries = self.get_boundaries()
+            return boundaries[number - 2] if number - 2 < len(boundaries) else None
+
+        cache_key = versioned_key(self.namespace, f'page_boundary:{self.cache_key}:{self.per_page}:{number}')
+        return get_or_build(cache_key, build)
+
+    def page_queryset(self, number):
+        """
+        Queryset записей страницы number (номер уже проверен validate_number).
+        """
+        if number == 1:
+            return self.object_list[:self.per_page]
+        boundary = self.get_boundary(number)
+        if boundary is not None:
+            return keyset_after(self.object_list, boundary)[:self.per_page]
+        # Границы нет (данные изменились, а кэш ещё нет) — обычный OFFSET
+        bottom = (number - 1) * self.per_page
+        return self.object_list[bottom:bottom + self.per_page]
+
+    def page(self, number):
+        number = self.validate_number(number)
+        # Граница страницы ищется только при обращении к записям: если вызывающий
+        # код подставляет строки из своего кэша (как главная), она не нужна
+        return self._get_page(SimpleLazyObject(lambda: self.page_queryset(number)), number, self)
@@ -0,0 +1,80 @@
+# blog/search.py
+
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Конфигурация полнотекстового поиска PostgreSQL (русская морфология)
+SEARCH_CONFIG = 'russian'
+
+
+def is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def search_vector_expression(model):
+    """
+    Выражение tsvector для поста или статьи: заголовки весят больше описания,
+    описание, категория и теги — больше основного текста.
+    """
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import SearchVector
+
+    category_name = Subquery(
+        model._meta.get_field('category').related_model.objects
+        .filter(pk=OuterRef('category_id')).values('name')[:1]
+    )
+    through = model.tags.through
+    source_field = model._meta.get_field('tags').m2m_field_name()
+    target_field = model._meta.get_field('tags').m2m_reverse_field_name()
+    tag_names = Subquery(
+        through.objects.filter(**{source_field: OuterRef('pk')})
+        .values(source_field)
+        .annotate(names=StringAgg(f'{target_field}__name', delimiter=' '))
+        .values('names')[:1]
+    )
+    return (
+        SearchVector('h1', 'title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(category_name, Value('')), Coalesce(tag_names, Value('')),
+                       weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('content', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(model, pks=None):
+    """
+    Пересчитывает сохранённый search_vector одним UPDATE.
+    На других СУБД (SQLite в тестах) ничего не делает.
+
+    :param model: Post или ArticlePost
+    :param pks: Идентификаторы записей (по умолчанию все)
+    """
+    if not is_postgresql():
+        return 0
+    queryset = model.objects.all() if pks is None else model.objects.filter(pk__in=pks)
+    return queryset.update(search_vector=search_vector_expression(model))
+
+
+def search(model, query):
+    """
+    Возвращает queryset записей модели, подходящих под запрос.
+
+    На PostgreSQL используется GIN-индекс по search_vector и ранжирование
+    SearchRank, на остальных СУБД — простой поиск через LIKE.
+    """
+    if is_postgresql():
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return model.objects.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-created_at', '-id')  # id — чтобы страницы OFFSET не повторяли и не теряли строки
+
+    return model.objects.filter(
+        Q(title__icontains=query) |
+        Q(h1__icontains=query) |
+        Q(content__icontains=query) |
+        Q(category__name__icontains=query) |
+        Q(tags__name__icontains=query)
+    ).distinct().order_by('-created_at', '-id')
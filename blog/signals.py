@@ -0,0 +1,165 @@
+# blog/signals.py
+
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.db.models import F
+from django.dispatch import receiver
+from blog.models import Post, Tag, Category, StaticPage, ArticleCategory, ArticlePost, ArticleTag, Comment
+from blog.search import update_search_vectors
+from blog.sitemaps import schedule_sitemap_rebuild
+from blog.cache_utils import (
+    bump_cache_version, category_namespace,
+    BLOG_NAMESPACE, ARTICLES_NAMESPACE, CATEGORY_TAGS_NAMESPACE
+)
+
+
+# Любое изменение работ, тегов, категорий и страниц меняет сайдбар и списки
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=StaticPage)
+@receiver(post_delete, sender=StaticPage)
+@receiver(post_save, sender=ArticleCategory)
+@receiver(post_delete, sender=ArticleCategory)
+def invalidate_blog_cache(sender, **kwargs):
+    bump_cache_version(BLOG_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=Category.tags.through)
+def invalidate_blog_cache_on_tags_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_cache_version(BLOG_NAMESPACE)
+
+
+# Изменения статей, их тегов и категорий меняют сайдбар статей
+@receiver(post_save, sender=ArticlePost)
+@receiver(post_delete, sender=ArticlePost)
+@receiver(post_save, sender=ArticleTag)
+@receiver(post_delete, sender=ArticleTag)
+@receiver(post_save, sender=ArticleCategory)
+@receiver(post_delete, sender=ArticleCategory)
+def invalidate_articles_cache(sender, **kwargs):
+    bump_cache_version(ARTICLES_NAMESPACE)
+
+
+@receiver(m2m_changed, sender=ArticlePost.tags.through)
+@receiver(m2m_changed, sender=ArticleCategory.tags.through)
+def invalidate_articles_cache_on_tags_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_cache_version(ARTICLES_NAMESPACE)
+
+
+# Рейтинг тегов категории сбрасывается только у затронутых категорий
+def invalidate_categories(category_ids):
+    for category_id in set(category_ids):
+        if category_id is not None:
+            bump_cache_version(category_namespace(category_id))
+
+
+@receiver(post_save, sender=Post)
+def invalidate_category_tags_on_post_save(sender, instance, created, **kwargs):
+    loaded_category_id = getattr(instance, '_loaded_category_id', None)
+    # У нового поста ещё нет тегов, а без смены категории рейтинг не меняется
+    if not created and loaded_category_id != instance.category_id:
+        invalidate_categories([loaded_category_id, instance.category_id])
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_category_tags_on_post_delete(sender, instance, **kwargs):
+    invalidate_categories([instance.category_id])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_category_tags_on_post_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # instance — пост
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_categories([instance.category_id])
+        return
+
+    # instance — тег, pk_set — идентификаторы постов
+    if action == 'pre_clear':
+        instance._cleared_category_ids = list(
+            Post.objects.filter(tags=instance).values_list('category_id', flat=True).distinct()
+        )
+    elif action == 'post_clear':
+        invalidate_categories(getattr(instance, '_cleared_category_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        invalidate_categories(
+            Post.objects.filter(pk__in=pk_set).values_list('category_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def invalidate_category_tags_on_tag_change(sender, **kwargs):
+    bump_cache_version(CATEGORY_TAGS_NAMESPACE)
+
+
+# Денормализованный рейтинг поста: применяем разницу между старым и новым
+# состоянием комментария атомарными UPDATE ... SET rating_sum = rating_sum + N
+def apply_rating_change(old_state, new_state):
+    if old_state == new_state:
+        return
+    changes = {}
+    if old_state:
+        post_id, rating = old_state
+        total, count = changes.get(post_id, (0, 0))
+        changes[post_id] = (total - rating, count - 1)
+    if new_state:
+        post_id, rating = new_state
+        total, count = changes.get(post_id, (0, 0))
+        changes[post_id] = (total + rating, count + 1)
+    for post_id, (total, count) in changes.items():
+        if total or count:
+            Post.objects.filter(pk=post_id).update(
+                rating_sum=F('rating_sum') + total,
+                rating_count=F('rating_count') + count,
+            )
+
+
+@receiver(post_save, sender=Comment)
+def update_post_rating_on_comment_save(sender, instance, **kwargs):
+    new_state = instance.rating_state()
+    apply_rating_change(getattr(instance, '_loaded_rating_state', None), new_state)
+    instance._loaded_rating_state = new_state
+
+
+@receiver(post_delete, sender=Comment)
+def update_post_rating_on_comment_delete(sender, instance, **kwargs):
+    apply_rating_change(getattr(instance, '_loaded_rating_state', instance.rating_state()), None)
+
+
+# Полнотекстовый индекс поста зависит от его полей и тегов
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=ArticlePost)
+def update_search_vector_on_save(sender, instance, **kwargs):
+    update_search_vectors(sender, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+@receiver(m2m_changed, sender=ArticlePost.tags.through)
+def update_search_vector_on_tags_change(sender, instance, action, reverse, pk_set, model, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        update_search_vectors(type(instance), [instance.pk])
+    elif pk_set:
+        update_search_vectors(model, pk_set)
+
+
+# Собранная карта сайта: в очередь ставится пересборка только страницы с изменённой записью
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=ArticlePost)
+@receiver(post_delete, sender=ArticlePost)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ArticleCategory)
+@receiver(post_delete, sender=ArticleCategory)
+def rebuild_sitemap_on_change(sender, instance, **kwargs):
+    schedule_sitemap_rebuild(sender, [instance.pk])
@@ -1,71 +1,401 @@
-from django.contrib.sitemaps import Sitemap
-from django.core.paginator import Paginator
-from django.http import HttpResponse
-from .models import Post, Category, ArticlePost, ArticleCategory
-
-class PostSitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.8
-
-    def items(self):
-        return Post.objects.all()
-
-    def lastmod(self, obj):
-        return obj.created_at  # Убедитесь, что у вас есть это поле в модели Post
-
-class CategorySitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.7
-
-    def items(self):
-        return Category.objects.all()
-
-class ArticlePostSitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.8
-
-    def items(self):
-        return ArticlePost.objects.all()
-
-    def lastmod(self, obj):
-        return obj.created_at
-
-class ArticleCategorySitemap(Sitemap):
-    changefreq = "weekly"
-    priority = 0.7
-
-    def items(self):
-        return ArticleCategory.objects.all()
-
-class PaginatorSitemap(Sitemap):
-    def get_urls(self, page=1, site=None, protocol=None):
-        paginator = Paginator(self.items(), 10000)  # 10 000 элементов на одну карту сайта
-        urls = []
-
-        for i in range(1, paginator.num_pages + 1):
-            urls.extend(super().get_urls(page=i, site=site, protocol=protocol))
-
-        return urls
-
-class CustomSitemapIndex:
-    def __init__(self, sitemaps):
-        self.sitemaps = sitemaps
-
-    def get_urls(self, page=1, site=None, protocol=None):
-        urls = []
-        for section, site in self.sitemaps.items():
-            if isinstance(site, dict):
-                site = site['sitemap']
-            urls.extend(site().get_urls(page, site, protocol))
-        for url in urls:
-            url['location'] = url['location'].replace('sitemap.xml', 'custom_sitemap.xml')
-        return urls
-
-def custom_sitemap_view(request):
-    sitemap_index = CustomSitemapIndex({
-        'posts': PostSitemap(),
-        'categories': CategorySitemap(),
-        'article_posts': ArticlePostSitemap(),
-        'article_categories': ArticleCategorySitemap(),
-    })
-    return HttpResponse(sitemap_index.get_urls(), content_type='application/xml')
+# blog/sitemaps.py
+
+import datetime
+import gzip
+import itertools
+import os
+import re
+import tempfile
+from xml.sax.saxutils import escape
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+from .cache_utils import get_or_build_versioned, BLOG_NAMESPACE, ARTICLES_NAMESPACE
+from .models import Post, Category, ArticlePost, ArticleCategory, Job
+
+# Предел протокола sitemaps.org: не больше 50 000 URL в одном файле
+SITEMAP_MAX_URLS = 50000
+
+# Сколько строк читается из БД за раз при генерации страницы карты сайта
+SITEMAP_FETCH_SIZE = 2000
+
+SITEMAP_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAP_FOOTER = '</urlset>\n'
+SITEMAP_INDEX_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAP_INDEX_FOOTER = '</sitemapindex>\n'
+
+# Имена собранных файлов в SITEMAP_ROOT
+SITEMAP_INDEX_FILENAME = 'sitemap.xml.gz'
+SITEMAP_PAGE_FILENAME_RE = re.compile(r'^sitemap-(?P<section>\w+)-(?P<page>\d+)\.xml\.gz$')
+
+# Размер куска при отдаче распакованного файла клиенту без поддержки gzip
+SITEMAP_READ_SIZE = 64 * 1024
+
+
+def sitemap_page_for_id(pk):
+    return (pk - 1) // SITEMAP_MAX_URLS + 1
+
+
+class SitemapSection:
+    """
+    Раздел карты сайта: записи одной модели, разбитые на страницы по диапазонам id.
+    Страница N содержит записи с id от (N-1)*SITEMAP_MAX_URLS+1 до N*SITEMAP_MAX_URLS,
+    поэтому в ней не больше SITEMAP_MAX_URLS адресов, а изменение записи касается
+    только одной страницы. Пустые диапазоны (после удалений) в индекс не попадают.
+
+    :param model: Модель с полем slug
+    :param url_name: Имя маршрута страницы записи, принимающего slug
+    :param namespace: Пространство имён кэша, версия которого меняется при записи модели
+    :param dated: Есть ли у модели created_at (lastmod и Last-Modified)
+    """
+
+    def __init__(self, model, url_name, namespace, changefreq='weekly', priority=0.8, dated=True):
+        self.model = model
+        self.url_name = url_name
+        self.namespace = namespace
+        self.changefreq = changefreq
+        self.priority = priority
+        self.dated = dated
+
+    def page_queryset(self, page):
+        return self.model.objects.filter(
+            id__gt=(page - 1) * SITEMAP_MAX_URLS, id__lte=page * SITEMAP_MAX_URLS
+        ).order_by('id')
+
+    def build_pages(self):
+        # Номер страницы и её lastmod для всех непустых диапазонов одним GROUP BY
+        page_number = ExpressionWrapper((F('id') - 1) / SITEMAP_MAX_URLS + 1, output_field=IntegerField())
+        pages = self.model.objects.order_by().annotate(page=page_number).values('page')
+        if self.dated:
+            pages = pages.annotate(lastmod=Max('created_at'))
+        else:
+            pages = pages.annotate(urls=Count('id'))
+        return [(row['page'], row.get('lastmod')) for row in pages.order_by('page')]
+
+    def get_pages(self):
+        """
+        Список (номер страницы, lastmod) из кэша до изменения данных раздела.
+        """
+        return get_or_build_versioned(self.namespace, f'sitemap_pages:{self.model._meta.model_name}', self.build_pages)
+
+    def page_lastmod(self, page):
+        return dict(self.get_pages()).get(page)
+
+    def url_template(self):
+        # Маршрут строится один раз, а slug подставляется в готовую строку:
+        # reverse() на каждую из 50 000 записей заметно дороже
+        return reverse(self.url_name, args=['__slug__'])
+
+    def iter_urls(self, page, base_url):
+        template = self.url_template()
+        fields = ('slug', 'created_at') if self.dated else ('slug',)
+        rows = self.page_queryset(page).values_list(*fields).iterator(chunk_size=SITEMAP_FETCH_SIZE)
+        tail = f'<changefreq>{self.changefreq}</changefreq><priority>{self.priority}</priority></url>\n'
+        for row in rows:
+            loc = escape(base_url + template.replace('__slug__', row[0]))
+            lastmod = f'<lastmod>{row[1].isoformat()}</lastmod>' if self.dated else ''
+            yield f'<url><loc>{loc}</loc>{lastmod}{tail}'
+
+
+SITEMAP_SECTIONS = {
+    'posts': SitemapSection(Post, 'post_detail', BLOG_NAMESPACE),
+    'categories': SitemapSection(Category, 'category_detail', BLOG_NAMESPACE, priority=0.7, dated=False),
+    'articles': SitemapSection(ArticlePost, 'article_post_detail', ARTICLES_NAMESPACE),
+    'article_categories': SitemapSection(ArticleCategory, 'article_category_detail', ARTICLES_NAMESPACE,
+                                         priority=0.7, dated=False),
+}
+
+
+def get_section(section):
+    try:
+        return SITEMAP_SECTIONS[section]
+    except KeyError:
+        raise Http404("Раздел карты сайта не найден")
+
+
+def iter_sitemap_page(section, page, base_url):
+    """
+    XML страницы раздела по частям: записи читаются из БД пачками и в память целиком не попадают.
+    """
+    yield SITEMAP_HEADER
+    yield from get_section(section).iter_urls(page, base_url)
+    yield SITEMAP_FOOTER
+
+
+def iter_sitemap_index(base_url):
+    yield SITEMAP_INDEX_HEADER
+    for name, section in SITEMAP_SECTIONS.items():
+        for page, lastmod in section.get_pages():
+            loc = escape(base_url + reverse('sitemap_section', kwargs={'section': name, 'page': page}))
+            lastmod = f'<lastmod>{lastmod.isoformat()}</lastmod>' if lastmod else ''
+            yield f'<sitemap><loc>{loc}</loc>{lastmod}</sitemap>\n'
+    yield SITEMAP_INDEX_FOOTER
+
+
+def section_for_model(model):
+    for name, section in SITEMAP_SECTIONS.items():
+        if section.model is model:
+            return name
+    return None
+
+
+def site_base_url(request):
+    return request.build_absolute_uri('/').rstrip('/')
+
+
+# Собранные файлы: поисковики получают готовый gzip без запросов к БД
+
+def sitemap_path(filename):
+    return os.path.join(settings.SITEMAP_ROOT, filename)
+
+
+def sitemap_page_filename(section, page):
+    return f'sitemap-{section}-{page}.xml.gz'
+
+
+def write_gzip(filename, chunks):
+    """
+    Пишет куски XML в gzip-файл. Файл собирается во временном и подменяет
+    старый через os.replace, так что читатель не увидит недописанный файл.
+    """
+    os.makedirs(settings.SITEMAP_ROOT, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=settings.SITEMAP_ROOT, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as output:
+            for chunk in chunks:
+                output.write(chunk.encode('utf-8'))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, sitemap_path(filename))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_sitemap_page(section, page, base_url=None):
+    """
+    Собирает файл страницы раздела одним проходом по БД. Если в диапазоне id
+    не осталось записей, файл удаляется. Возвращает True, если файл записан.
+    """
+    urls = SITEMAP_SECTIONS[section].iter_urls(page, base_url or settings.SITEMAP_BASE_URL)
+    first = next(urls, None)
+    if first is None:
+        path = sitemap_path(sitemap_page_filename(section, page))
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+    write_gzip(sitemap_page_filename(section, page), itertools.chain([SITEMAP_HEADER, first], urls, [SITEMAP_FOOTER]))
+    return True
+
+
+def built_sitemap_pages():
+    """
+    Собранные страницы по разделам: {раздел: [(страница, время изменения файла)]}.
+    """
+    pages = {name: [] for name in SITEMAP_SECTIONS}
+    if not os.path.isdir(settings.SITEMAP_ROOT):
+        return pages
+    for filename in os.listdir(settings.SITEMAP_ROOT):
+        match = SITEMAP_PAGE_FILENAME_RE.match(filename)
+        if match and match['section'] in pages:
+            modified = os.stat(sitemap_path(filename)).st_mtime
+            pages[match['section']].append((int(match['page']), modified))
+    for section_pages in pages.values():
+        section_pages.sort()
+    return pages
+
+
+def iter_built_sitemap_index(base_url):
+    yield SITEMAP_INDEX_HEADER
+    for name, section_pages in built_sitemap_pages().items():
+        for page, modified in section_pages:
+            loc = escape(base_url + reverse('sitemap_section', kwargs={'section': name, 'page': page}))
+            lastmod = datetime.datetime.fromtimestamp(modified, tz=datetime.timezone.utc).isoformat()
+            yield f'<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>\n'
+    yield SITEMAP_INDEX_FOOTER
+
+
+def build_sitemap_index(base_url=None):
+    # Индекс строится по списку собранных файлов, к БД не обращается
+    write_gzip(SITEMAP_INDEX_FILENAME, iter_built_sitemap_index(base_url or settings.SITEMAP_BASE_URL))
+
+
+def build_sitemap_section(section, base_url=None):
+    """
+    Пересобирает все страницы раздела и удаляет файлы страниц, которых больше нет.
+    Возвращает число записанных файлов.
+    """
+    pages = [page for page, _ in SITEMAP_SECTIONS[section].build_pages()]
+    built = sum(build_sitemap_page(section, page, base_url) for page in pages)
+    for page, _ in built_sitemap_pages()[section]:
+        if page not in pages:
+            os.remove(sitemap_path(sitemap_page_filename(section, page)))
+    return built
+
+
+# Пересборка при изменении данных. Сохранение записи не собирает файлы само,
+# а отмечает страницу в задаче очереди (Job), которую выполняет воркер run_jobs.
+# Пока задача ждёт воркера, новые изменения дописываются в неё же, поэтому
+# серия сохранений пересобирает каждую страницу один раз.
+
+def prebuilt_sitemaps_enabled():
+    # Пока карта ни разу не собрана командой build_sitemaps, она строится из БД:
+    # индекс из одной пересобранной страницы заменил бы полную карту
+    return os.path.exists(sitemap_path(SITEMAP_INDEX_FILENAME))
+
+
+def pending_sitemap_job():
+    return Job.objects.filter(kind=Job.KIND_SITEMAP, status=Job.STATUS_PENDING).order_by('id').first()
+
+
+def job_covers(job, section, pages):
+    if job is None or section not in job.params.get('sections', {}):
+        return False
+    current = job.params['sections'][section]
+    return current is None or (pages is not None and set(pages) <= set(current))
+
+
+def add_to_sitemap_job(section, pages=None):
+    """
+    Добавляет страницы раздела в ожидающую задачу пересборки или создаёт её.
+    Если ожидающая задача их уже содержит, ничего не блокирует и не пишет:
+    так импорт категорий построчно делает на каждую строку одно чтение.
+
+    :param pages: Номера страниц; None — весь раздел
+    """
+    if job_covers(pending_sitemap_job(), section, pages):
+        return
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update()
+            .filter(kind=Job.KIND_SITEMAP, status=Job.STATUS_PENDING)
+            .order_by('id')
+            .first()
+        ) or Job(kind=Job.KIND_SITEMAP, target=Job.TARGET_SITEMAP, params={'sections': {}})
+        sections = job.params.setdefault('sections', {})
+        current = sections.get(section, [])
+        merged = None if pages is None or current is None else sorted(set(current) | set(pages))
+        if job.pk is None or section not in sections or current != merged:
+            sections[section] = merged
+            job.save()
+
+
+def enqueue_sitemap_rebuild(section, pages=None):
+    """
+    Планирует пересборку страниц раздела после фиксации текущей транзакции.
+    Задача, которую воркер возьмёт после фиксации, уже увидит новые данные,
+    а строки таблицы задач не блокируются на время транзакции изменения данных.
+    Если процесс упадёт между фиксацией и постановкой задачи, страницу обновит
+    следующее изменение раздела или build_sitemaps.
+
+    :param pages: Номера страниц; None — весь раздел
+    """
+    if section is None or not prebuilt_sitemaps_enabled():
+        return
+    transaction.on_commit(lambda: add_to_sitemap_job(section, pages))
+
+
+def schedule_sitemap_pages_rebuild(model, pages):
+    pages = sorted(pages)
+    if pages:
+        enqueue_sitemap_rebuild(section_for_model(model), pages)
+
+
+def schedule_sitemap_rebuild(model, pks):
+    schedule_sitemap_pages_rebuild(model, {sitemap_page_for_id(pk) for pk in pks if pk is not None})
+
+
+def schedule_sitemap_section_rebuild(model):
+    enqueue_sitemap_rebuild(section_for_model(model))
+
+
+# Отдача. Если файл собран, ответ строится по нему без запросов к БД:
+# Last-Modified и ETag берутся из времени изменения и размера файла.
+# Пока файла нет (команда build_sitemaps ещё не запускалась), XML строится из БД.
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def requested_sitemap_stat(section=None, page=None):
+    if section is None:
+        filename = SITEMAP_INDEX_FILENAME
+    elif section in SITEMAP_SECTIONS:
+        filename = sitemap_page_filename(section, page)
+    else:
+        return None
+    try:
+        return os.stat(sitemap_path(filename))
+    except FileNotFoundError:
+        return None
+
+
+def sitemap_etag(request, section=None, page=None):
+    stat = requested_sitemap_stat(section, page)
+    if stat is None:
+        return None
+    # Сжатый и распакованный ответы — разные представления, у них разные ETag
+    encoding = 'gzip' if accepts_gzip(request) else 'identity'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{encoding}"'
+
+
+def sitemap_lastmod(request, section=None, page=None):
+    stat = requested_sitemap_stat(section, page)
+    if stat is not None:
+        return datetime.datetime.fromtimestamp(stat.st_mtime, tz=datetime.timezone.utc)
+    # Файла нет — самый свежий created_at раздела
+    if section is None:
+        dates = [lastmod for item in SITEMAP_SECTIONS.values() for _, lastmod in item.get_pages() if lastmod]
+        return max(dates) if dates else None
+    if section not in SITEMAP_SECTIONS:
+        return None
+    return SITEMAP_SECTIONS[section].page_lastmod(page)
+
+
+def iter_gunzip(source):
+    try:
+        while chunk := source.read(SITEMAP_READ_SIZE):
+            yield chunk
+    finally:
+        source.close()
+
+
+def prebuilt_sitemap_response(request, filename):
+    """
+    Ответ по собранному файлу. Файл открывается здесь, до создания ответа:
+    если его нет, FileNotFoundError получает представление и отвечает из БД
+    или 404, а не обрывает уже начатый потоковый ответ.
+    """
+    path = sitemap_path(filename)
+    if accepts_gzip(request):
+        with open(path, 'rb') as source:
+            response = HttpResponse(source.read(), content_type='application/xml')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(iter_gunzip(gzip.open(path, 'rb')), content_type='application/xml')
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+@condition(etag_func=sitemap_etag, last_modified_func=sitemap_lastmod)
+def sitemap_index(request):
+    try:
+        return prebuilt_sitemap_response(request, SITEMAP_INDEX_FILENAME)
+    except FileNotFoundError:
+        return StreamingHttpResponse(iter_sitemap_index(site_base_url(request)), content_type='application/xml')
+
+
+@condition(etag_func=sitemap_etag, last_modified_func=sitemap_lastmod)
+def sitemap_section(request, section, page):
+    sitemap = get_section(section)
+    try:
+        return prebuilt_sitemap_response(request, sitemap_page_filename(section, page))
+    except FileNotFoundError:
+        pass
+    if page not in dict(sitemap.get_pages()):
+        raise Http404("Страница карты сайта не найдена")
+    return StreamingHttpResponse(iter_sitemap_page(section, page, site_base_url(request)),
+                                 content_type='application/xml')
@@ -0,0 +1,87 @@
+# blog/tests/test_autocomplete.py
+
+import threading
+from unittest import mock
+from django.test import SimpleTestCase
+from blog import autocomplete
+from blog.autocomplete import PrefixIndex
+
+SUBJECTS = ['экономике', 'истории', 'философии', 'социологии', 'педагогике', 'психологии']
+
+# Частые слова («курсовая», «работа») встречаются в каждом названии, нужные — в трёх
+ENTRIES = (
+    [(f'Курсовая работа по {subject} {n}', 'post', f'kursovaia-{subject}-{n}')
+     for subject in SUBJECTS for n in range(5)]
+    + [(f'Курсовая работа по гражданскому праву {n}', 'post', f'kursovaia-pravo-{n}') for n in range(3)]
+)
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = PrefixIndex(ENTRIES)
+
+    def labels(self, query):
+        return {label for label, _, _ in self.index.search(query)}
+
+    def test_rare_short_word_is_the_anchor(self):
+        # Диапазон «курсовая» больше лимита кандидатов, а «праву» — три слова
+        with mock.patch.object(autocomplete, 'MAX_PREFIX_CANDIDATES', 10):
+            for query in ['курсовая работа праву', 'курсовая гражданскому']:
+                matches = self.index._prefix_matches(query.split())
+                self.assertEqual(
+                    {self.index.entries[position][0] for position in matches},
+                    {f'Курсовая работа по гражданскому праву {n}' for n in range(3)}, query,
+                )
+                # Точные совпадения идут перед подсказками с опечатками
+                self.assertEqual(self.index.search(query)[:3], [self.index.entries[position] for position in sorted(matches)])
+
+    def test_all_tokens_must_match(self):
+        self.assertEqual(self.index._prefix_matches(['истории', 'праву']), [])
+        self.assertEqual(len(self.index._prefix_matches(['работа', 'истор'])), 5)
+
+    def test_fuzzy_ignores_skipped_trigrams(self):
+        # Триграммы частых слов пропускаются; опечатка в редком слове должна находиться
+        with mock.patch.object(autocomplete, 'MAX_POSTING_LENGTH', 5):
+            labels = self.labels('курсовая работа гражданскму праву')
+        self.assertEqual(labels, {f'Курсовая работа по гражданскому праву {n}' for n in range(3)})
+
+    def test_word_form_found_by_fuzzy_search(self):
+        # «право» не префикс «праву»: такие запросы находит поиск по триграммам
+        law = {f'Курсовая работа по гражданскому праву {n}' for n in range(3)}
+        with mock.patch.object(autocomplete, 'MAX_PREFIX_CANDIDATES', 10), \
+                mock.patch.object(autocomplete, 'MAX_POSTING_LENGTH', 5):
+            self.assertEqual(self.labels('курсовая право'), law)
+        self.assertEqual({label for label, _, _ in self.index.search('курсовая право')[:3]}, law)
+
+    def test_fuzzy_with_only_frequent_trigrams_returns_nothing(self):
+        with mock.patch.object(autocomplete, 'MAX_POSTING_LENGTH', 5):
+            self.assertEqual(self.index._fuzzy_matches('курсовая работа', 20), [])
+
+
+class GetIndexTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(autocomplete, _index=None, _index_version=None, _last_check=0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stale_index_is_served_while_rebuilding(self):
+        old_index, new_index = PrefixIndex(ENTRIES[:1]), PrefixIndex(ENTRIES)
+        autocomplete._index, autocomplete._index_version = old_index, (1, 1)
+        release = threading.Event()
+
+        def slow_build():
+            release.wait(5)
+            return new_index
+
+        with mock.patch.object(autocomplete, '_current_version', return_value=(2, 1)), \
+                mock.patch.object(PrefixIndex, 'build', side_effect=slow_build):
+            self.assertIs(autocomplete.get_index(), old_index)
+            rebuild = next(thread for thread in threading.enumerate() if thread.name == 'autocomplete-rebuild')
+            autocomplete._last_check = 0.0
+            # Второй запрос не запускает ещё одну пересборку
+            self.assertIs(autocomplete.get_index(), old_index)
+            release.set()
+            rebuild.join(5)
+
+        self.assertIs(autocomplete._index, new_index)
+        self.assertEqual(autocomplete._index_version, (2, 1))
@@ -0,0 +1,103 @@
+# blog/tests/test_cache_backends.py
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from blog.cache_backends import SQLiteCache, TwoTierCache
+
+
+def add_in_child(path, barrier, results):
+    # Отдельный процесс со своим подключением, как воркер gunicorn
+    cache = SQLiteCache(path, {})
+    barrier.wait()
+    results.put(cache.add('lock', os.getpid(), 30))
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'cache', 'shared.sqlite3')
+        self.cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+
+    def test_get_set_delete(self):
+        self.cache.set('key', {'posts': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'posts': [1, 2]})
+        self.assertTrue(self.cache.has_key('key'))
+        self.assertTrue(self.cache.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_expired_values_are_missing(self):
+        self.cache.set('key', 1, 0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.touch('key', 30))
+        # Истёкшее значение не мешает add
+        self.assertTrue(self.cache.add('key', 2, 30))
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_add_does_not_overwrite(self):
+        self.assertTrue(self.cache.add('key', 'first', None))
+        self.assertFalse(self.cache.add('key', 'second', None))
+        self.assertEqual(self.cache.get('key'), 'first')
+
+    def test_incr(self):
+        self.cache.set('counter', 5)
+        self.assertEqual(self.cache.incr('counter', 3), 8)
+        self.assertEqual(self.cache.get('counter'), 8)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_keeps_max_entries(self):
+        self.cache.CULL_EVERY = 5
+        for n in range(30):
+            self.cache.set(f'key-{n}', n, 100 + n)
+        count = self.cache._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        self.assertLessEqual(count, 15)
+        # Первыми удаляются записи, которые истекают раньше
+        self.assertEqual(self.cache.get('key-29'), 29)
+
+    def test_add_is_atomic_across_processes(self):
+        context = multiprocessing.get_context('fork')
+        workers = 8
+        barrier = context.Barrier(workers)
+        results = context.Queue()
+        processes = [context.Process(target=add_in_child, args=(self.path, barrier, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        added = [results.get(timeout=30) for _ in processes]
+        for process in processes:
+            process.join()
+        self.assertEqual(added.count(True), 1)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'tier_test_shared': {
+                'BACKEND': 'blog.cache_backends.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'shared.sqlite3'),
+            },
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.cache = TwoTierCache('tier-test', {'OPTIONS': {
+            'L2': 'tier_test_shared', 'L1_TIMEOUT': 60, 'L1_KEY_PREFIXES': ['cache_version'],
+        }})
+
+    def test_hot_keys_are_served_from_l1(self):
+        self.cache.set('cache_version:blog', 1, None)
+        caches['tier_test_shared'].set('cache_version:blog', 2, None)
+        # Другой воркер сменил версию — этот видит её только после L1_TIMEOUT
+        self.assertEqual(self.cache.get('cache_version:blog'), 1)
+
+    def test_other_keys_go_to_l2(self):
+        self.cache.set('count:category:1', 10)
+        caches['tier_test_shared'].set('count:category:1', 11)
+        self.assertEqual(self.cache.get('count:category:1'), 11)
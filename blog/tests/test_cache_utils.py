@@ -0,0 +1,89 @@
+# blog/tests/test_cache_utils.py
+
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from blog import cache_utils
+from blog.cache_utils import (
+    bump_cache_version, defer_cache_invalidation, get_cache_version, get_or_build, get_or_build_versioned,
+    versioned_key, BLOG_NAMESPACE,
+)
+
+
+class GetOrBuildTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def builder(self, value='value'):
+        def build():
+            self.builds += 1
+            return value
+        return build
+
+    def test_builds_once(self):
+        self.assertEqual(get_or_build('key', self.builder()), 'value')
+        self.assertEqual(get_or_build('key', self.builder()), 'value')
+        self.assertEqual(self.builds, 1)
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_stale_value_served_while_locked(self):
+        cache.set('key', ('old', time.time() - 1))
+        cache.add('key:lock', 1)
+        self.assertEqual(get_or_build('key', self.builder('new')), 'old')
+        self.assertEqual(self.builds, 0)
+
+    def test_stale_value_refreshed_by_lock_holder(self):
+        cache.set('key', ('old', time.time() - 1))
+        self.assertEqual(get_or_build('key', self.builder('new')), 'new')
+        self.assertEqual(cache.get('key')[0], 'new')
+
+    def test_last_good_value_served_after_version_bump(self):
+        self.assertEqual(get_or_build_versioned(BLOG_NAMESPACE, 'common_context', self.builder('v1')), 'v1')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_cache_version(BLOG_NAMESPACE)
+        # Другой процесс уже пересчитывает значение новой версии
+        cache.add(f"{versioned_key(BLOG_NAMESPACE, 'common_context')}:lock", 1)
+
+        with mock.patch.object(cache_utils.time, 'sleep', side_effect=AssertionError('ожидание блокировки')):
+            self.assertEqual(get_or_build_versioned(BLOG_NAMESPACE, 'common_context', self.builder('v2')), 'v1')
+        self.assertEqual(self.builds, 1)
+
+    def test_lock_holder_rebuilds_after_version_bump(self):
+        get_or_build_versioned(BLOG_NAMESPACE, 'common_context', self.builder('v1'))
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_cache_version(BLOG_NAMESPACE)
+
+        self.assertEqual(get_or_build_versioned(BLOG_NAMESPACE, 'common_context', self.builder('v2')), 'v2')
+        self.assertEqual(cache.get('common_context:last')[0], 'v2')
+
+    def test_waits_without_last_good_value(self):
+        cache.add('key:lock', 1)
+        with mock.patch.object(cache_utils, 'LOCK_WAIT', 0.1):
+            self.assertEqual(get_or_build('key', self.builder('own')), 'own')
+        # Запись держателя блокировки не перезаписывается
+        self.assertIsNone(cache.get('key'))
+
+
+class CacheVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_waits_for_commit(self):
+        version = get_cache_version(BLOG_NAMESPACE)
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_cache_version(BLOG_NAMESPACE)
+            self.assertEqual(get_cache_version(BLOG_NAMESPACE), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_cache_version(BLOG_NAMESPACE), version)
+
+    def test_deferred_invalidation_bumps_once(self):
+        with mock.patch.object(cache_utils, '_bump') as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                with defer_cache_invalidation():
+                    for _ in range(3):
+                        bump_cache_version(BLOG_NAMESPACE)
+                    bump.assert_not_called()
+        bump.assert_called_once_with(BLOG_NAMESPACE)
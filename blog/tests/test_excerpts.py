@@ -0,0 +1,66 @@
+# blog/tests/test_excerpts.py
+
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from blog.cache_utils import get_cache_version, BLOG_NAMESPACE, ARTICLES_NAMESPACE
+from blog.models import Post, ArticlePost
+from blog.utils import build_excerpt, process_markdown, render_markdown
+
+LONG_CONTENT = (
+    "**Содержание**\n\nГлава 1. Понятие договора\nГлава 2. Виды договоров\n\n"
+    "**Введение**\n\nАктуальность темы определяется тем, что договор остаётся основным "
+    "инструментом гражданского оборота.\n\n"
+    "**Глава 1. Понятие договора**\n\n"
+    + "Договор представляет собой соглашение двух или нескольких лиц. " * 8
+    + "Стороны свободны в заключении договора. Понуждение к заключению договора не допускается."
+)
+
+
+class ExcerptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_long_post_gets_index_excerpt(self):
+        excerpt = build_excerpt(LONG_CONTENT, render_markdown(LONG_CONTENT))
+
+        self.assertEqual(excerpt, process_markdown(LONG_CONTENT))
+        self.assertTrue(excerpt)
+        self.assertNotIn('Содержание', excerpt)
+        self.assertNotIn('Глава 2', excerpt)
+
+    def test_short_post_falls_back_to_beginning(self):
+        content = "Короткая **аннотация** работы."
+        self.assertEqual(process_markdown(content), '')
+        self.assertEqual(build_excerpt(content, render_markdown(content)), 'Короткая аннотация работы.')
+
+    def test_save_stores_excerpt(self):
+        post = Post.objects.create(name='Договор', title='t', content=LONG_CONTENT)
+        self.assertEqual(post.excerpt, process_markdown(LONG_CONTENT))
+        self.assertEqual(Post.objects.create(name='Пусто', title='t').excerpt, '')
+
+    def test_backfill_recomputes_and_bumps_cache(self):
+        post = Post.objects.create(name='Договор', title='t', content=LONG_CONTENT)
+        Post.objects.filter(pk=post.pk).update(excerpt='')
+        version = get_cache_version(BLOG_NAMESPACE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('backfill_excerpts', model=['post'], only_missing=True, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, process_markdown(LONG_CONTENT))
+        self.assertNotEqual(get_cache_version(BLOG_NAMESPACE), version)
+
+    def test_rebuild_content_html_recomputes_excerpt(self):
+        article = ArticlePost.objects.create(name='Статья', title='t', content='Первый текст.')
+        ArticlePost.objects.filter(pk=article.pk).update(content='Новый текст.')
+        version = get_cache_version(ARTICLES_NAMESPACE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_content_html', model=['articlepost'], stdout=StringIO())
+
+        article.refresh_from_db()
+        self.assertIn('Новый текст.', article.content_html)
+        self.assertEqual(article.excerpt, 'Новый текст.')
+        self.assertNotEqual(get_cache_version(ARTICLES_NAMESPACE), version)
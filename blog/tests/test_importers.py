@@ -0,0 +1,108 @@
+# blog/tests/test_importers.py
+
+from django.test import TestCase
+from blog.importers import post_importer
+from blog.models import Post, Category, Tag
+
+
+def row(name, **values):
+    values.setdefault('title', f'{name} — заголовок')
+    values.setdefault('content', f'Текст про {name}.')
+    values.setdefault('category', 'Курсовые')
+    return dict(values, h1=name)
+
+
+class BulkImporterTests(TestCase):
+    def test_creates_posts_with_categories_and_tags(self):
+        stats = post_importer().run([
+            row('Курсовая по праву', tags='право, гражданское право'),
+            row('Курсовая по истории', tags='история', category='Рефераты'),
+        ])
+
+        self.assertEqual((stats['created'], stats['updated'], stats['errors']), (2, 0, []))
+        post = Post.objects.get(name='Курсовая по праву')
+        self.assertEqual(post.category.name, 'Курсовые')
+        self.assertEqual(sorted(post.tags.values_list('name', flat=True)), ['гражданское право', 'право'])
+        self.assertEqual(post.slug, 'kursovaia-po-pravu')
+        self.assertTrue(post.content_html)
+        self.assertEqual(post.excerpt, 'Текст про Курсовая по праву.')
+        self.assertEqual(set(Category.objects.values_list('name', flat=True)), {'Курсовые', 'Рефераты'})
+
+    def test_upsert_by_id_keeps_slug(self):
+        post_importer().run([row('Диплом', id=500, tags='экономика')])
+        post = Post.objects.get(pk=500)
+
+        stats = post_importer().run([row('Диплом', id=500, title='Новый заголовок', tags='финансы')])
+
+        self.assertEqual((stats['created'], stats['updated']), (0, 1))
+        updated = Post.objects.get(pk=500)
+        self.assertEqual((updated.title, updated.slug), ('Новый заголовок', post.slug))
+        self.assertEqual(list(updated.tags.values_list('name', flat=True)), ['финансы'])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_skip_unchanged_matches_rows_by_name(self):
+        post_importer().run([row('Эссе о праве'), row('Эссе об истории')])
+
+        stats = post_importer(skip_unchanged=True).run([
+            row('Эссе о праве'),
+            row('Эссе об истории', title='Исправленный заголовок'),
+            row('Эссе о философии'),
+        ])
+
+        self.assertEqual((stats['created'], stats['updated'], stats['unchanged']), (1, 1, 1))
+        self.assertEqual(Post.objects.get(name='Эссе об истории').title, 'Исправленный заголовок')
+        # Без режима сравнения строка без id считалась бы новой записью с суффиксом
+        self.assertFalse(Post.objects.filter(name__startswith='Эссе о праве-').exists())
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_duplicate_ids_keep_last_row(self):
+        stats = post_importer().run([
+            row('Отчёт', id=7, title='первая'),
+            row('Отчёт', id=7, title='вторая'),
+        ])
+
+        self.assertEqual((stats['created'], stats['skipped']), (1, 1))
+        self.assertIn('7: повторяется в файле', stats['errors'][0])
+        self.assertEqual(Post.objects.get(pk=7).title, 'вторая')
+
+    def test_invalid_rows_are_skipped(self):
+        stats = post_importer().run([row(''), row('Реферат', sources='много')])
+
+        self.assertEqual((stats['created'], stats['skipped']), (0, 2))
+        self.assertEqual(len(stats['errors']), 2)
+        self.assertFalse(Post.objects.exists())
+
+    def test_integrity_error_retries_chunk(self):
+        # Между пачками параллельный импорт занимает имя, которое резолвер уже
+        # считает свободным: первая попытка второй пачки падает на уникальном
+        # индексе, повтор перечитывает занятые значения
+        def take_name(raw_rows, stats):
+            if not Post.objects.filter(name='Диплом-2').exists():
+                Post.objects.create(name='Диплом-2', slug='diplom-2', title='чужой')
+
+        stats = post_importer(chunk_size=1, on_chunk=take_name).run([row('Диплом'), row('Диплом')])
+
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(
+            set(Post.objects.values_list('name', 'slug')),
+            {('Диплом', 'diplom'), ('Диплом-2', 'diplom-2'), ('Диплом-3', 'diplom-3')},
+        )
+
+    def test_dry_run_writes_nothing(self):
+        post_importer().run([row('Контрольная', id=10)])
+
+        importer = post_importer(dry_run=True, skip_unchanged=True)
+        stats = importer.run([
+            row('Контрольная', id=10, title='другой заголовок', tags='новый тег'),
+            row('Лабораторная', category='Новая категория'),
+        ])
+
+        self.assertEqual((stats['created'], stats['updated']), (1, 1))
+        self.assertEqual(importer.preview, [
+            {'action': 'update', 'id': 10, 'name': 'Контрольная'},
+            {'action': 'insert', 'id': None, 'name': 'Лабораторная'},
+        ])
+        self.assertEqual(Post.objects.get(pk=10).title, 'Контрольная — заголовок')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(Category.objects.filter(name='Новая категория').exists())
+        self.assertFalse(Tag.objects.exists())
@@ -0,0 +1,154 @@
+# blog/tests/test_leads.py
+
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from blog.leads import claim_leads, deliver_lead, enqueue_lead, make_session, DELIVERY_LEASE
+from blog.models import OutboundLead
+
+
+class StubPartnerHandler(BaseHTTPRequestHandler):
+    # Отвечает кодами из server.responses по очереди (последний повторяется) и запоминает тела запросов
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        self.server.received.append(parse_qs(body))
+        status = self.server.responses.pop(0) if len(self.server.responses) > 1 else self.server.responses[0]
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.end_headers()
+        self.wfile.write(b'ok' if status == 200 else b'error')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LeadDeliveryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubPartnerHandler)
+        cls.server.received = []
+        cls.server.responses = [200]
+        cls.url = f"http://127.0.0.1:{cls.server.server_port}/order"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.received.clear()
+        self.session = make_session()
+        self.addCleanup(self.session.close)
+
+    def respond_with(self, *statuses):
+        self.server.responses[:] = statuses
+
+    def test_success_marks_lead_sent(self):
+        self.respond_with(200)
+        lead = enqueue_lead({'Email': 'a@example.com', 'Name': 'Анна'})
+
+        self.assertEqual(deliver_lead(self.session, lead, url=self.url), OutboundLead.STATUS_SENT)
+
+        lead.refresh_from_db()
+        self.assertEqual((lead.status, lead.attempts, lead.response_status), (OutboundLead.STATUS_SENT, 1, 200))
+        self.assertIsNotNone(lead.sent_at)
+        self.assertEqual(self.server.received, [{'Email': ['a@example.com'], 'Name': ['Анна']}])
+
+    def test_server_error_is_retried_with_backoff(self):
+        self.respond_with(503)
+        lead = enqueue_lead({'Email': 'b@example.com'})
+
+        before = timezone.now()
+        self.assertEqual(deliver_lead(self.session, lead, url=self.url), OutboundLead.STATUS_FAILED)
+        lead.refresh_from_db()
+        self.assertEqual((lead.attempts, lead.response_status), (1, 503))
+        self.assertIn('HTTP 503', lead.last_error)
+        first_delay = lead.next_attempt_at - before
+        # Первая пауза 30 с с разбросом 0.5–1.0
+        self.assertGreaterEqual(first_delay, datetime.timedelta(seconds=15))
+        self.assertLessEqual(first_delay, datetime.timedelta(seconds=31))
+
+        # Повторы: пауза растёт с номером попытки
+        for _ in range(3):
+            deliver_lead(self.session, lead, url=self.url)
+        lead.refresh_from_db()
+        self.assertEqual((lead.status, lead.attempts), (OutboundLead.STATUS_FAILED, 4))
+        self.assertGreaterEqual(lead.next_attempt_at - timezone.now(), datetime.timedelta(seconds=110))
+
+    def test_retry_succeeds_after_failures(self):
+        self.respond_with(500, 429, 200)
+        lead = enqueue_lead({'Email': 'c@example.com'})
+
+        statuses = [deliver_lead(self.session, lead, url=self.url) for _ in range(3)]
+
+        self.assertEqual(statuses, [OutboundLead.STATUS_FAILED, OutboundLead.STATUS_FAILED, OutboundLead.STATUS_SENT])
+        self.assertEqual(len(self.server.received), 3)
+        lead.refresh_from_db()
+        self.assertEqual((lead.attempts, lead.last_error), (3, ''))
+
+    def test_gives_up_after_max_attempts(self):
+        self.respond_with(502)
+        lead = enqueue_lead({'Email': 'd@example.com'})
+
+        statuses = [deliver_lead(self.session, lead, url=self.url, max_attempts=3) for _ in range(3)]
+
+        self.assertEqual(statuses[-1], OutboundLead.STATUS_DEAD)
+        lead.refresh_from_db()
+        self.assertEqual((lead.status, lead.attempts), (OutboundLead.STATUS_DEAD, 3))
+        # Недоставленная заявка больше не попадает в выборку воркера
+        OutboundLead.objects.filter(pk=lead.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(claim_leads(), [])
+
+    def test_permanent_client_error_gives_up_at_once(self):
+        self.respond_with(400)
+        lead = enqueue_lead({'Email': 'e@example.com'})
+
+        self.assertEqual(deliver_lead(self.session, lead, url=self.url), OutboundLead.STATUS_DEAD)
+        lead.refresh_from_db()
+        self.assertEqual((lead.attempts, lead.response_status), (1, 400))
+
+    def test_connection_error_is_retried(self):
+        lead = enqueue_lead({'Email': 'f@example.com'})
+        closed_port = ThreadingHTTPServer(('127.0.0.1', 0), StubPartnerHandler)
+        url = f"http://127.0.0.1:{closed_port.server_port}/order"
+        closed_port.server_close()
+
+        self.assertEqual(deliver_lead(self.session, lead, url=url), OutboundLead.STATUS_FAILED)
+        lead.refresh_from_db()
+        self.assertIsNone(lead.response_status)
+        self.assertTrue(lead.last_error)
+
+    def test_claim_leases_leads(self):
+        due = enqueue_lead({'Email': 'g@example.com'})
+        later = enqueue_lead({'Email': 'later@example.com'})
+        OutboundLead.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + datetime.timedelta(hours=1))
+
+        self.assertEqual([lead.pk for lead in claim_leads()], [due.pk])
+        # Взятая заявка скрыта от других воркеров на время аренды
+        self.assertEqual(claim_leads(), [])
+        due.refresh_from_db()
+        self.assertGreater(due.next_attempt_at, timezone.now() + DELIVERY_LEASE - datetime.timedelta(minutes=1))
+
+        # Воркер упал, не записав результат: после аренды заявку берут снова
+        OutboundLead.objects.filter(pk=due.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual([lead.pk for lead in claim_leads()], [due.pk])
+
+    def test_command_delivers_due_leads(self):
+        self.respond_with(200)
+        leads = [enqueue_lead({'Email': f'{n}@example.com'}) for n in range(3)]
+
+        call_command('deliver_leads', once=True, url=self.url, stdout=StringIO())
+
+        self.assertEqual(len(self.server.received), 3)
+        self.assertEqual(
+            set(OutboundLead.objects.filter(pk__in=[lead.pk for lead in leads]).values_list('status', flat=True)),
+            {OutboundLead.STATUS_SENT},
+        )
@@ -0,0 +1,102 @@
+# blog/tests/test_pagination.py
+
+import datetime
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import TestCase
+from django.utils import timezone
+from blog.cache_utils import bump_cache_version, BLOG_NAMESPACE
+from blog.models import Post, Category
+from blog.pagination import CachedCountPaginator, KeysetPaginator
+
+
+def create_posts(count, category=None, start=0):
+    # bulk_create без сигналов: кэш сбрасывают сами тесты
+    return Post.objects.bulk_create([
+        Post(name=f'Работа {n}', slug=f'rabota-{n}', title='t', category=category)
+        for n in range(start, start + count)
+    ])
+
+
+class CachedCountPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Курсовые', slug='kursovye', title='t', h1='h', description='d')
+
+    def paginator(self):
+        return CachedCountPaginator(Post.objects.filter(category=self.category).order_by('-id'), 10,
+                                    cache_key=f'category:{self.category.pk}')
+
+    def test_count_is_cached_until_version_bump(self):
+        create_posts(25, self.category)
+        self.assertEqual(self.paginator().count, 25)
+
+        create_posts(5, self.category, start=25)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, 25)
+
+        # Версия меняется после фиксации транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_cache_version(BLOG_NAMESPACE)
+        paginator = self.paginator()
+        self.assertEqual((paginator.count, paginator.num_pages), (30, 3))
+
+    def test_without_cache_key_counts_every_time(self):
+        create_posts(3, self.category)
+        paginator = CachedCountPaginator(Post.objects.order_by('-id'), 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 3)
+
+    def test_explicit_count_skips_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCountPaginator(Post.objects.order_by('-id'), 10, count=42).num_pages, 5)
+
+
+class KeysetPaginatorTests(TestCase):
+    per_page = 5
+
+    def setUp(self):
+        cache.clear()
+        posts = create_posts(23)
+        # Одинаковый created_at у целых групп записей, в том числе на границах страниц
+        base = timezone.now()
+        for index, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=base - datetime.timedelta(hours=index // 4))
+
+    def offset_pages(self):
+        paginator = Paginator(Post.objects.order_by('-created_at', '-id'), self.per_page)
+        return [[post.pk for post in paginator.page(number)] for number in paginator.page_range]
+
+    def keyset_pages(self, **kwargs):
+        paginator = KeysetPaginator(Post.objects.all(), self.per_page, **kwargs)
+        return [[post.pk for post in paginator.page(number)] for number in paginator.page_range]
+
+    def test_pages_match_offset_pagination(self):
+        expected = self.offset_pages()
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(self.keyset_pages(), expected)
+        self.assertEqual(self.keyset_pages(cache_key='posts'), expected)
+
+    def test_cached_boundaries_are_reused(self):
+        self.keyset_pages(cache_key='posts')
+        paginator = KeysetPaginator(Post.objects.all(), self.per_page, cache_key='posts')
+        # Счётчик и граница из кэша, остаётся один запрос за записями страницы
+        with self.assertNumQueries(1):
+            list(paginator.page(4))
+
+    def test_page_without_access_to_rows_does_no_queries(self):
+        paginator = KeysetPaginator(Post.objects.all(), self.per_page, cache_key='posts', count=23)
+        with self.assertNumQueries(0):
+            page = paginator.page(3)
+            self.assertEqual((page.number, page.has_next()), (3, True))
+
+    def test_boundaries_follow_version_bump(self):
+        self.keyset_pages(cache_key='posts')
+        newest = Post.objects.create(name='Новая работа', title='t')
+        Post.objects.filter(pk=newest.pk).update(created_at=timezone.now() + datetime.timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_cache_version(BLOG_NAMESPACE)
+
+        expected = self.offset_pages()
+        self.assertEqual(expected[0][0], newest.pk)
+        self.assertEqual(self.keyset_pages(cache_key='posts'), expected)
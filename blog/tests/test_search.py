@@ -0,0 +1,28 @@
+# blog/tests/test_search.py
+
+from django.core.paginator import Paginator
+from django.test import TestCase
+from django.utils import timezone
+from blog.models import Post
+from blog.search import search
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        Post.objects.bulk_create([
+            Post(name=f'Курсовая {n}', slug=f'kursovaia-{n}', title=f'Курсовая по праву {n}') for n in range(7)
+        ])
+        Post.objects.create(name='Реферат', title='Реферат по истории')
+        # Одинаковая дата у всех: порядок задаёт только id
+        Post.objects.update(created_at=timezone.now())
+
+    def test_results_have_stable_order(self):
+        results = search(Post, 'праву')
+        ids = list(results.values_list('id', flat=True))
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_pages_do_not_repeat_rows(self):
+        paginator = Paginator(search(Post, 'праву'), 3)
+        seen = [post.pk for number in paginator.page_range for post in paginator.page(number)]
+        self.assertEqual(sorted(seen), sorted(Post.objects.filter(title__contains='праву').values_list('id', flat=True)))
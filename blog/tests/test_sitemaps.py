@@ -0,0 +1,123 @@
+# blog/tests/test_sitemaps.py
+
+import gzip
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from blog.models import Post, Category, Job
+
+
+@override_settings(ROOT_URLCONF='myproject.urls', SITEMAP_BASE_URL='https://example.test')
+class SitemapViewTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(SITEMAP_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        category = Category.objects.create(name='Курсовые', slug='kursovye', title='t', h1='h', description='d')
+        Post.objects.create(name='Курсовая по праву', title='t', category=category)
+
+    def build(self):
+        call_command('build_sitemaps', stdout=StringIO())
+
+    def get(self, url, gzip_accepted=False, **extra):
+        if gzip_accepted:
+            extra['HTTP_ACCEPT_ENCODING'] = 'gzip, deflate'
+        return self.client.get(url, **extra)
+
+    def test_index_from_database_before_build(self):
+        for url in ['/sitemap.xml', '/custom_sitemap.xml']:
+            for gzip_accepted in (False, True):
+                response = self.get(url, gzip_accepted)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Content-Encoding', response)
+                content = b''.join(response.streaming_content).decode()
+                self.assertIn('/sitemap-posts-1.xml', content)
+
+    def test_page_from_database_before_build(self):
+        response = self.get('/sitemap-posts-1.xml')
+        self.assertIn('/kursovaia-po-pravu', b''.join(response.streaming_content).decode())
+        self.assertEqual(self.get('/sitemap-posts-2.xml').status_code, 404)
+
+    def test_prebuilt_files(self):
+        self.build()
+
+        plain = self.get('/sitemap-posts-1.xml')
+        self.assertEqual(plain.status_code, 200)
+        content = b''.join(plain.streaming_content)
+        self.assertIn(b'/kursovaia-po-pravu', content)
+
+        compressed = self.get('/sitemap-posts-1.xml', gzip_accepted=True)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), content)
+        self.assertNotEqual(plain['ETag'], compressed['ETag'])
+
+        not_modified = self.get('/sitemap-posts-1.xml', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_missing_page_after_build_is_404(self):
+        self.build()
+        for gzip_accepted in (False, True):
+            self.assertEqual(self.get('/sitemap-posts-2.xml', gzip_accepted).status_code, 404)
+            self.assertEqual(self.get('/sitemap-unknown-1.xml', gzip_accepted).status_code, 404)
+
+
+@override_settings(ROOT_URLCONF='myproject.urls', SITEMAP_BASE_URL='https://example.test')
+class SitemapRebuildQueueTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(SITEMAP_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Курсовые', slug='kursovye', title='t', h1='h', description='d')
+        call_command('build_sitemaps', stdout=StringIO())
+
+    def pending_sections(self):
+        return [job.params['sections'] for job in Job.objects.filter(kind=Job.KIND_SITEMAP, status=Job.STATUS_PENDING)]
+
+    def test_job_is_queued_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Post.objects.create(name='Курсовая', title='t', category=self.category)
+            self.assertFalse(Job.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.pending_sections(), [{'posts': [1]}])
+
+    def test_covered_pages_do_not_touch_the_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(name='Курсовая 1', title='t', category=self.category)
+
+        lock = mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=QuerySet.select_for_update)
+        with lock as select_for_update, CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            for n in range(5):
+                Category.objects.update_or_create(name=f'Категория {n}', defaults={
+                    'slug': f'kategoriia-{n}', 'title': 't', 'h1': 'h', 'description': 'd',
+                })
+                Post.objects.create(name=f'Курсовая {n + 2}', title='t', category=self.category)
+
+        job_writes = [query['sql'] for query in queries if 'blog_job' in query['sql']
+                      and not query['sql'].lstrip().upper().startswith('SELECT')]
+        # Одна блокировка и одна запись — добавление раздела категорий, посты уже в задаче
+        job_locks = [call for call in select_for_update.call_args_list if call.args[0].model is Job]
+        self.assertEqual(len(job_locks), 1)
+        self.assertEqual(len(job_writes), 1)
+        self.assertEqual(self.pending_sections(), [{'posts': [1], 'categories': [1]}])
+
+    def test_running_job_gets_a_new_one(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(name='Курсовая 1', title='t', category=self.category)
+        Job.objects.filter(kind=Job.KIND_SITEMAP).update(status=Job.STATUS_RUNNING)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(name='Курсовая 2', title='t', category=self.category)
+        self.assertEqual(self.pending_sections(), [{'posts': [1]}])
+        self.assertEqual(Job.objects.filter(kind=Job.KIND_SITEMAP).count(), 2)
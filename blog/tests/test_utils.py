@@ -0,0 +1,34 @@
+# blog/tests/test_utils.py
+
+from django.test import TestCase
+from blog.importers import post_importer
+from blog.models import Post
+from blog.utils import UniqueValueResolver
+
+
+class UniqueValueResolverTests(TestCase):
+    def test_suffix_taken_while_base_is_free(self):
+        # base свободно, а base-2 занято: второй дубль пачки должен получить base-3
+        Post.objects.create(name='Эссе-2', title='t')
+        resolver = UniqueValueResolver(Post, 'name')
+        resolver.load(['Эссе', 'Эссе'])
+        self.assertEqual([resolver.resolve('Эссе'), resolver.resolve('Эссе')], ['Эссе', 'Эссе-3'])
+
+    def test_more_duplicates_than_preloaded_candidates(self):
+        for n in range(2, 6):
+            Post.objects.create(name=f'Реферат-{n}', title='t')
+        resolver = UniqueValueResolver(Post, 'name')
+        resolver.load(['Реферат', 'Реферат'])
+        self.assertEqual([resolver.resolve('Реферат') for _ in range(3)], ['Реферат', 'Реферат-6', 'Реферат-7'])
+
+    def test_import_with_duplicate_names_and_taken_suffix(self):
+        Post.objects.create(name='Эссе-2', title='t')
+        stats = post_importer().run([
+            {'h1': 'Эссе', 'title': 't', 'content': 'x', 'category': 'Кат'},
+            {'h1': 'Эссе', 'title': 't', 'content': 'x', 'category': 'Кат'},
+        ])
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(
+            set(Post.objects.values_list('name', 'slug')),
+            {('Эссе-2', 'esse-2'), ('Эссе', 'esse'), ('Эссе-3', 'esse-3')},
+        )
@@ -11,6 +11,7 @@ urlpatterns = [
     path('about/', views.about, name='about'),
     path('privacy-policy/', views.privacy_policy, name='privacy_policy'),
     path('search/', views.search, name='search'),
+    path('search/autocomplete/', views.autocomplete, name='autocomplete'),
     path('article_post/<slug:slug>/', views.article_post_detail, name='article_post_detail'),
     path('article_category/<slug:slug>/', views.article_category_detail, name='article_category_detail'),
     path('tag/<slug:slug>/', views.article_tagged, name='article_tagged'),
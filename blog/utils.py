@@ -1,6 +1,19 @@
 import re
+from collections import Counter
+import markdown2
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 from unidecode import unidecode
 
+# Расширения markdown2, с которыми рендерится контент постов и страниц
+MARKDOWN_EXTRAS = [
+    "fenced-code-blocks",
+    "tables",
+    "break-on-newline",
+    "header-ids",
+    "code-friendly"
+]
+
 def transliterate(value):
     # Транслитерация строки
     value = unidecode(value)
@@ -8,3 +21,123 @@ def transliterate(value):
     value = re.sub(r'[^\w\s-]', '', value).strip().lower()
     value = re.sub(r'[-\s]+', '-', value)
     return value
+
+# Сколько вариантов base-N проверяется одним запросом, если заранее проверенных не хватило
+UNIQUE_CHECK_BATCH = 20
+
+# Подбор уникальных значений поля (name, slug) для пачки записей в памяти
+class UniqueValueResolver:
+    """
+    Вместо запроса на каждого кандидата проверяет занятость base и base-2, base-3...
+    для всех базовых значений пачки запросами field IN (...) — они идут по
+    уникальному индексу поля — и раздаёт свободные суффиксы в памяти.
+    От гонок с параллельным импортом защищает уникальный индекс в БД:
+    при IntegrityError вызывающий код делает reset() и повторяет пачку.
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.reset()
+
+    def reset(self):
+        self.taken = set()
+        self.checked = set()
+        self.next_counter = {}
+
+    def check(self, candidates):
+        candidates = set(candidates) - self.checked
+        if not candidates:
+            return
+        self.checked |= candidates
+        self.taken |= set(
+            self.model.objects.filter(**{f'{self.field}__in': candidates}).values_list(self.field, flat=True)
+        )
+
+    def load(self, values):
+        # Для базового значения, которое встречается в пачке N раз, проверяются
+        # base и base-2...base-(N+1): обычно этого хватает, чтобы resolve()
+        # обошёлся без запросов. Варианты проверяются и тогда, когда base свободно:
+        # base-2 может быть занято, даже если base нет
+        counts = Counter(values)
+        self.check(
+            candidate
+            for base, count in counts.items()
+            for candidate in [base] + [f"{base}-{n}" for n in range(2, count + 2)]
+        )
+
+    def resolve(self, value):
+        candidate = value
+        counter = self.next_counter.get(value, 2)
+        while True:
+            if candidate not in self.checked:
+                # Проверенные заранее варианты кончились — следующая порция одним запросом
+                self.check([candidate] + [f"{value}-{n}" for n in range(counter, counter + UNIQUE_CHECK_BATCH)])
+            if candidate not in self.taken:
+                break
+            candidate = f"{value}-{counter}"
+            counter += 1
+        if candidate != value:
+            self.next_counter[value] = counter
+        self.taken.add(candidate)
+        return candidate
+
+def render_markdown(content):
+    # Преобразование markdown в HTML. Вызывается при сохранении и импорте,
+    # представления читают уже готовый HTML из content_html
+    if not content:
+        return ''
+    return markdown2.markdown(content, extras=MARKDOWN_EXTRAS)
+
+def process_markdown(content, offset=200, length=200):
+    # Удаляем заголовки "Содержание" и "Введение" вместе с их содержимым
+    content = re.sub(r'\*\*Содержание\*\*(.*?)(?=\*\*|$)', '', content, flags=re.DOTALL)
+    content = re.sub(r'\*\*Введение\*\*(.*?)(?=\*\*|$)', '', content, flags=re.DOTALL)
+    content = re.sub(r'\*\*Заключение\*\*(.*?)(?=\*\*|$)', '', content, flags=re.DOTALL)
+    
+    # Удаляем все оставшиеся заголовки (строки, начинающиеся с # или **)
+    content = re.sub(r'^(#|\*\*).*$', '', content, flags=re.MULTILINE)
+    
+    # Удаляем markdown-форматирование
+    content = re.sub(r'(\*\*|\*|__|_|`|#)', '', content)
+    
+    # Удаляем пустые строки и лишние пробелы
+    content = re.sub(r'\n+', ' ', content)
+    content = re.sub(r'\s+', ' ', content).strip()
+    
+    # Пропускаем первые offset символов
+    if len(content) > offset:
+        content = content[offset:]
+    else:
+        return ""  # Возвращаем пустую строку, если контент короче, чем offset
+    
+    # Находим начало первого полного предложения
+    sentence_start = re.search(r'[.!?]\s+[A-ZА-Я]', content)
+    if sentence_start:
+        content = content[sentence_start.start()+2:]
+    
+    # Обрезаем текст до нужной длины
+    truncated_content = Truncator(content).chars(length)
+    
+    # Добавляем многоточие в конце, если текст был обрезан
+    if len(content) > length:
+        truncated_content += '...'
+    
+    return truncated_content
+
+def make_excerpt(content_html, words=30, length=200):
+    # Начало текста: 30 слов, не больше 200 символов (как фильтры
+    # markdown_to_plaintext|truncatewords:30|truncate_chars:200 в шаблонах)
+    text = strip_tags(content_html or '')
+    text = Truncator(text).words(words, truncate=' …')
+    text = re.sub(r'&\w+;', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    if len(text) > length:
+        return text[:length] + '...'
+    return text
+
+def build_excerpt(content, content_html):
+    # Анонс для списков, считается при сохранении. process_markdown пропускает
+    # оглавление и вступление; короткий пост, у которого после пропуска ничего
+    # не осталось, получает начало текста
+    return process_markdown(content or '') or make_excerpt(content_html)
@@ -1,23 +1,18 @@
 # Стандартные библиотеки Python
 import logging
-import re
+from collections import defaultdict
 
 # Django импорты
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.cache import cache_page
 from django.db.models import Count, Q, Prefetch
 from django.urls import reverse
-from django.core.paginator import Paginator
 from django.utils.safestring import mark_safe
 from django.http import HttpResponse, JsonResponse
 from django.core.cache import cache
-from django.utils.text import Truncator
-from django.utils.html import strip_tags
 
 # Сторонние библиотеки
-import requests
 import pandas as pd
-import markdown2
 
 # Импорты из вашего приложения
 from .models import (
@@ -25,110 +20,110 @@ from .models import (
     ArticleCategory, ArticlePost, ArticleTag
 )
 from .forms import CommentForm, GoogleSheetURLForm
+from .utils import render_markdown
+from .search import search as search_backend
+from .importers import post_importer, dataframe_rows
+from .leads import enqueue_lead
+from .exporters import iter_export_rows, excel_response
+from .pagination import KeysetPaginator, CachedCountPaginator
+from . import autocomplete as autocomplete_index
+from .cache_utils import (
+    versioned_key, category_namespace, get_or_build, get_or_build_versioned, defer_cache_invalidation,
+    BLOG_NAMESPACE, ARTICLES_NAMESPACE, CATEGORY_TAGS_NAMESPACE
+)
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
 
-def process_markdown(content, offset=200, length=200):
-    # Удаляем заголовки "Содержание" и "Введение" вместе с их содержимым
-    content = re.sub(r'\*\*Содержание\*\*(.*?)(?=\*\*|$)', '', content, flags=re.DOTALL)
-    content = re.sub(r'\*\*Введение\*\*(.*?)(?=\*\*|$)', '', content, flags=re.DOTALL)
-    content = re.sub(r'\*\*Заключение\*\*(.*?)(?=\*\*|$)', '', content, flags=re.DOTALL)
-    
-    # Удаляем все оставшиеся заголовки (строки, начинающиеся с # или **)
-    content = re.sub(r'^(#|\*\*).*$', '', content, flags=re.MULTILINE)
-    
-    # Удаляем markdown-форматирование
-    content = re.sub(r'(\*\*|\*|__|_|`|#)', '', content)
-    
-    # Удаляем пустые строки и лишние пробелы
-    content = re.sub(r'\n+', ' ', content)
-    content = re.sub(r'\s+', ' ', content).strip()
-    
-    # Пропускаем первые offset символов
-    if len(content) > offset:
-        content = content[offset:]
-    else:
-        return ""  # Возвращаем пустую строку, если контент короче, чем offset
-    
-    # Находим начало первого полного предложения
-    sentence_start = re.search(r'[.!?]\s+[A-ZА-Я]', content)
-    if sentence_start:
-        content = content[sentence_start.start()+2:]
-    
-    # Обрезаем текст до нужной длины
-    truncated_content = Truncator(content).chars(length)
-    
-    # Добавляем многоточие в конце, если текст был обрезан
-    if len(content) > length:
-        truncated_content += '...'
-    
-    return truncated_content
+# Общие контексты
 
+def build_common_context():
+    categories = list(Category.objects.annotate(post_count=Count('posts')))
+    tags = list(Tag.objects.annotate(post_count=Count('posts')).order_by('-post_count')[:50])
+    static_pages = list(StaticPage.objects.all())
+    article_categories = list(ArticleCategory.objects.annotate(article_count=Count('articles')))
 
-# Общие контексты
+    return {
+        'categories': categories,
+        'tags': tags[:10],
+        'extra_tags': tags[10:],
+        'static_pages': static_pages,
+        'article_categories': article_categories,
+    }
 
-def get_common_context():
-    cache_key = 'common_context'
-    cached_context = cache.get(cache_key)
-    
-    if cached_context is None:
-        categories = list(Category.objects.annotate(post_count=Count('posts')))
-        tags = list(Tag.objects.annotate(post_count=Count('posts')).order_by('-post_count')[:50])
-        static_pages = list(StaticPage.objects.all())
-        article_categories = list(ArticleCategory.objects.annotate(article_count=Count('articles')))
-        
-        cached_context = {
-            'categories': categories,
-            'tags': tags[:10],
-            'extra_tags': tags[10:],
-            'static_pages': static_pages,
-            'article_categories': article_categories,
-        }
-        cache.set(cache_key, cached_context, 3600)  # кэшируем на 1 час
-    
-    return cached_context
 
+def get_common_context():
+    # Пересчитывается одним процессом, остальные получают готовое или устаревшее значение
+    return get_or_build_versioned(BLOG_NAMESPACE, 'common_context', build_common_context)
 
 
-def get_common_article_context():
-    categories = ArticleCategory.objects.annotate(article_post_count=Count('articles')).all()
-    tags = ArticleTag.objects.annotate(article_post_count=Count('article_posts')).order_by('-article_post_count')
+def build_common_article_context():
+    categories = list(ArticleCategory.objects.annotate(article_post_count=Count('articles')))
+    tags = list(ArticleTag.objects.annotate(article_post_count=Count('article_posts')).order_by('-article_post_count')[:50])
     return {
         'categories': categories,
-        'tags': tags,
+        'tags': tags[:10],
+        'extra_tags': tags[10:],
     }
 
-# Функция пагинации
-def handle_pagination(request, queryset, per_page=20):
-    paginator = Paginator(queryset, per_page)
-    page_number = request.GET.get('page')
+
+def get_common_article_context():
+    return get_or_build_versioned(ARTICLES_NAMESPACE, 'common_article_context', build_common_article_context)
+
+
+# Функция пагинации. Списки по дате (keyset=True) листаются по ключу (created_at, id)
+# без OFFSET; число записей для списков с cache_key хранится в кэше
+def handle_pagination(request, queryset, per_page=20, page_param='page', cache_key=None,
+                      namespace=BLOG_NAMESPACE, keyset=True):
+    paginator_class = KeysetPaginator if keyset and cache_key else CachedCountPaginator
+    paginator = paginator_class(queryset, per_page, cache_key=cache_key, namespace=namespace)
+    page_number = request.GET.get(page_param)
     page_obj = paginator.get_page(page_number)
     return page_obj
 
+# Рейтинг тегов категории: считается один раз и хранится в кэше до изменения
+# постов этой категории (см. blog/signals.py)
+CATEGORY_TAGS_LIMIT = 50
+
+
+def build_category_tag_ranking(category_id, limit=CATEGORY_TAGS_LIMIT):
+    return list(
+        Tag.objects.filter(posts__category_id=category_id)
+        .annotate(post_count=Count('posts'))
+        .order_by('-post_count')
+        .values('name', 'slug', 'post_count')[:limit]
+    )
+
+
+def get_category_tag_ranking(category_id, limit=CATEGORY_TAGS_LIMIT):
+    key = f'category_tags:{category_id}:{limit}'
+    cache_key = versioned_key(category_namespace(category_id), versioned_key(CATEGORY_TAGS_NAMESPACE, key))
+    return get_or_build(cache_key, lambda: build_category_tag_ranking(category_id, limit), last_good_key=f'{key}:last')
+
+
 # Функция для получения семантически похожих тегов (на основе постов в категории)
-def get_semantically_similar_tags(category, limit=50):
-    tags = Tag.objects.filter(posts__category=category).annotate(post_count=Count('posts')).order_by('-post_count')[:limit]
-    return tags
+def get_semantically_similar_tags(category, limit=CATEGORY_TAGS_LIMIT):
+    return get_category_tag_ranking(category.id, limit)
 
 # Представления для категорий с улучшенной логикой тегов
 
 
 def category_detail(request, slug):
-    category = get_object_or_404(
-        Category.objects.prefetch_related(
-            Prefetch('posts', queryset=Post.objects.select_related('category').prefetch_related('tags'))
-        ),
-        slug=slug
+    category = get_object_or_404(Category, slug=slug)
+
+    # Выбираются только посты текущей страницы и только нужные для списка колонки;
+    # теги подгружаются одним запросом для этих 20 постов
+    post_list = Post.objects.filter(category=category).only(
+        'id', 'h1', 'slug', 'excerpt', 'created_at', 'category_id'
+    ).prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id', 'name', 'slug'))
     )
+    page_obj = handle_pagination(request, post_list, cache_key=f'category:{category.id}')
+    for post in page_obj:
+        post.category = category
     
-    post_list = category.posts.all()
-    page_obj = handle_pagination(request, post_list)
-    
-    tags = Tag.objects.filter(posts__category=category).annotate(
-        post_count=Count('posts')
-    ).order_by('-post_count')[:50]
+    tags = get_category_tag_ranking(category.id)
 
     context = get_common_context()
     context.update({
@@ -150,39 +145,55 @@ def category_detail(request, slug):
 
 # Главная страница
 
-def index(request):
-    cache_key = 'index_page_data'
-    cached_data = cache.get(cache_key)
-
-    if cached_data is None:
-        posts = Post.objects.select_related('category').prefetch_related('tags').only(
-            'h1', 'slug', 'content', 'created_at', 'category__name', 'category__slug'
-        ).order_by('-created_at')
-
-        total_posts = Post.objects.count()
-
-        cached_data = {
-            'posts': list(posts),
-            'total_posts': total_posts
+INDEX_PER_PAGE = 20
+
+
+def build_index_page_rows(page_queryset):
+    # Лёгкие кортежи одной страницы вместо всей таблицы постов:
+    # (id, h1, slug, excerpt, created_at, category_name, category_slug, ((tag_name, tag_slug), ...))
+    posts = list(page_queryset.values_list(
+        'id', 'h1', 'slug', 'excerpt', 'created_at', 'category__name', 'category__slug'
+    ))
+    tags_by_post = defaultdict(list)
+    post_tags = Post.tags.through.objects.filter(
+        post_id__in=[post[0] for post in posts]
+    ).values_list('post_id', 'tag__name', 'tag__slug')
+    for post_id, tag_name, tag_slug in post_tags:
+        tags_by_post[post_id].append((tag_name, tag_slug))
+
+    return [post + (tuple(tags_by_post[post[0]]),) for post in posts]
+
+
+def get_index_page_rows(paginator, page_number):
+    # В кэше лежат только строки запрошенной страницы
+    rows = get_or_build_versioned(BLOG_NAMESPACE, f'index_page_data:{page_number}',
+                                  lambda: build_index_page_rows(paginator.page_queryset(page_number)))
+
+    return [
+        {
+            'id': post_id,
+            'h1': h1,
+            'slug': slug,
+            'excerpt': excerpt,
+            'created_at': created_at,
+            'category': {'name': category_name, 'slug': category_slug},
+            'tags': [{'name': tag_name, 'slug': tag_slug} for tag_name, tag_slug in tags],
         }
-        cache.set(cache_key, cached_data, 3600)  # кэшируем на 1 час
-    else:
-        posts = cached_data['posts']
-        total_posts = cached_data['total_posts']
+        for post_id, h1, slug, excerpt, created_at, category_name, category_slug, tags in rows
+    ]
 
-    paginator = Paginator(posts, 20)  # 20 постов на страницу
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
 
-    # Предварительная обработка контента постов
-    for post in page_obj:
-        if not hasattr(post, 'processed_content'):
-            post.processed_content = process_markdown(post.content, offset=200, length=200)
+def index(request):
+    # Число постов берётся из кэша (или из оценки планировщика для большой таблицы),
+    # строки страницы — из постраничного кэша, а при промахе выбираются по ключу без OFFSET
+    paginator = KeysetPaginator(Post.objects.all(), INDEX_PER_PAGE, cache_key='index')
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = get_index_page_rows(paginator, page_obj.number)
 
     context = get_common_context()
     context.update({
         'page_obj': page_obj,
-        'total_posts': total_posts,
+        'total_posts': paginator.count,
         'canonical_url': request.build_absolute_uri(),
         'next_url': page_obj.next_page_number() if page_obj.has_next() else None,
         'prev_url': reverse('index') if page_obj.number == 1 else page_obj.previous_page_number() if page_obj.has_previous() else None,
@@ -194,7 +205,7 @@ def index(request):
 
 
 def post_detail(request, slug):
-    post = get_object_or_404(Post.objects.select_related('category').prefetch_related('tags', 'comments'), slug=slug)
+    post = get_object_or_404(Post.objects.select_related('category').prefetch_related('tags').defer('content'), slug=slug)
     comments = post.comments.filter(approved=True)
     related_posts = post.get_similar_posts()
     breadcrumbs = [
@@ -202,17 +213,9 @@ def post_detail(request, slug):
         {'name': post.h1}
     ]
 
-    logger.info(f"Original content: {post.content}")
-
-    post.content = markdown2.markdown(post.content, extras=[
-        "fenced-code-blocks",
-        "tables",
-        "break-on-newline",
-        "header-ids",
-        "code-friendly"
-    ])
-
-    logger.info(f"Converted content: {post.content}")
+    # HTML рендерится при сохранении; для ещё не перестроенных записей рендерим на лету
+    if not post.content_html:
+        post.content_html = render_markdown(post.content)
 
     if request.method == 'POST':
         comment_form = CommentForm(request.POST)
@@ -242,8 +245,8 @@ def post_detail(request, slug):
 # Страница тегов
 def tagged(request, slug):
     tag = get_object_or_404(Tag, slug=slug)
-    post_list = Post.objects.filter(tags=tag).select_related('category').prefetch_related('tags')
-    page_obj = handle_pagination(request, post_list)
+    post_list = Post.objects.filter(tags=tag).select_related('category').prefetch_related('tags').defer('content', 'content_html')
+    page_obj = handle_pagination(request, post_list, cache_key=f'tag:{tag.id}')
     tags = Tag.objects.annotate(post_count=Count('posts')).order_by('-post_count')[:50]
     first_10_tags = tags[:10]
     extra_tags = tags[10:]
@@ -264,19 +267,10 @@ def tagged(request, slug):
     return render(request, 'tagged.html', context)
 
 def static_page(request, slug):
-    page = get_object_or_404(StaticPage, slug=slug)
+    page = get_object_or_404(StaticPage.objects.defer('content'), slug=slug)
     breadcrumbs = [{'name': page.h1}]
-    logger.info(f"Original static page content: {page.content}")
-
-    page.content = markdown2.markdown(page.content, extras=[
-        "fenced-code-blocks",
-        "tables",
-        "break-on-newline",
-        "header-ids",
-        "code-friendly"
-    ])
-
-    logger.info(f"Converted static page content: {page.content}")
+    if not page.content_html:
+        page.content_html = render_markdown(page.content)
 
     context = get_common_context()
     context.update({
@@ -294,22 +288,22 @@ def privacy_policy(request):
     context = get_common_context()
     return render(request, 'privacy-policy.html', context)
 
+SEARCH_PER_PAGE = 20
+
+
 def search(request):
-    query = request.GET.get('q')
-
-    post_results = Post.objects.filter(
-        Q(title__icontains=query) |
-        Q(content__icontains(query)) |
-        Q(category__name__icontains(query)) |
-        Q(tags__name__icontains(query))
-    ).distinct().select_related('category').prefetch_related('tags') if query else []
-
-    article_results = ArticlePost.objects.filter(
-        Q(title__icontains(query)) |
-        Q(content__icontains(query)) |
-        Q(category__name__icontains(query)) |
-        Q(tags__name__icontains(query))
-    ).distinct().select_related('category').prefetch_related('tags') if query else []
+    query = (request.GET.get('q') or '').strip()
+
+    post_results = article_results = None
+    if query:
+        post_results = handle_pagination(
+            request, search_backend(Post, query).only('id', 'title', 'slug', 'created_at'),
+            per_page=SEARCH_PER_PAGE, page_param='page'
+        )
+        article_results = handle_pagination(
+            request, search_backend(ArticlePost, query).only('id', 'title', 'slug', 'created_at'),
+            per_page=SEARCH_PER_PAGE, page_param='article_page'
+        )
 
     context = get_common_context()
     context.update({
@@ -319,55 +313,31 @@ def search(request):
     })
     return render(request, 'search_results.html', context)
 
+AUTOCOMPLETE_LIMIT = 20
+
+
+def autocomplete(request):
+    query = (request.GET.get('q') or '').strip()
+    if len(query) < 2:
+        return JsonResponse({'results': []})
+    return JsonResponse({'results': autocomplete_index.autocomplete(query, AUTOCOMPLETE_LIMIT)})
+
 # Импорт и экспорт данных
+@defer_cache_invalidation()
 def import_posts(request):
     if request.method == 'POST':
         file = request.FILES['file']
         df = pd.read_excel(file)
-
-        for _, row in df.iterrows():
-            category, _ = Category.objects.get_or_create(name=row['category'])
-            post, created = Post.objects.get_or_create(
-                id=row['id'],
-                defaults={
-                    'name': row['h1'],
-                    'title': row['title'],
-                    'h1': row['h1'],
-                    'content': row['content'],
-                    'category': category,
-                    'description': row['description']
-                }
-            )
-            if not created:
-                post.name = row['h1']
-                post.title = row['title']
-                post.h1 = row['h1']
-                post.content = row['content']
-                post.category = category
-                post.description = row['description']
-                post.save()
-
-            tags = row['tags'].split(',')
-            post.tags.clear()
-            for tag_name in tags:
-                tag, _ = Tag.objects.get_or_create(name=tag_name.strip())
-                post.tags.add(tag)
-
+        post_importer().run(dataframe_rows(df))
         return redirect('admin:blog_post_changelist')
     return render(request, 'admin/import.html')
 
 def export_posts(request):
-    posts = Post.objects.all().values('id', 'name', 'title', 'h1', 'content', 'category__name', 'description')
-    df = pd.DataFrame(posts)
-    df['tags'] = df.apply(
-        lambda row: ','.join(Post.objects.get(id=row['id']).tags.values_list('name', flat=True)),
-        axis=1
-    )
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=posts.xlsx'
-    df.to_excel(response, index=False)
-    return response
+    fields = ['id', 'name', 'title', 'h1', 'content', 'category__name', 'description']
+    rows = iter_export_rows(Post.objects.all(), fields, with_tags=True)
+    return excel_response(fields + ['tags'], rows, 'posts.xlsx')
 
+@defer_cache_invalidation()
 def import_google_sheets(request):
     if request.method == 'POST':
         form = GoogleSheetURLForm(request.POST)
@@ -375,34 +345,7 @@ def import_google_sheets(request):
             url = form.cleaned_data['url']
             data = get_google_sheets_data(url)
             df = pd.DataFrame(data[1:], columns=data[0])
-
-            for _, row in df.iterrows():
-                category, _ = Category.objects.get_or_create(name=row['category'])
-                post, created = Post.objects.get_or_create(
-                    id=row['id'],
-                    defaults={
-                        'name': row['h1'],
-                        'title': row['title'],
-                        'h1': row['h1'],
-                        'content': row['content'],
-                        'category': category,
-                        'description': row['description']
-                    }
-                )
-                if not created:
-                    post.name = row['h1'],
-                    post.title = row['title']
-                    post.h1 = row['h1']
-                    post.content = row['content']
-                    post.category = category
-                    post.description = row['description']
-                    post.save()
-
-                tags = row['tags'].split(',')
-                post.tags.clear()
-                for tag_name in tags:
-                    tag, _ = Tag.objects.get_or_create(name=tag_name.strip())
-                    post.tags.add(tag)
+            post_importer().run(dataframe_rows(df))
 
             return redirect('admin:blog_post_changelist')
     else:
@@ -411,9 +354,9 @@ def import_google_sheets(request):
 
 # Новые представления для работы с категориями и постами статей
 def article_category_detail(request, slug):
-    category = get_object_or_404(ArticleCategory.objects.prefetch_related('articles'), slug=slug)
-    article_list = category.articles.all().select_related('category').prefetch_related('tags')
-    page_obj = handle_pagination(request, article_list)
+    category = get_object_or_404(ArticleCategory, slug=slug)
+    article_list = category.articles.all().select_related('category').prefetch_related('tags').defer('content', 'content_html')
+    page_obj = handle_pagination(request, article_list, cache_key=f'article_category:{category.id}', namespace=ARTICLES_NAMESPACE)
     breadcrumbs = [{'name': category.h1}]
 
     context = get_common_article_context()
@@ -428,20 +371,15 @@ def article_category_detail(request, slug):
     return render(request, 'article_category.html', context)
 
 def article_post_detail(request, slug):
-    post = get_object_or_404(ArticlePost.objects.select_related('category').prefetch_related('tags', 'comments'), slug=slug)
+    post = get_object_or_404(ArticlePost.objects.select_related('category').prefetch_related('tags').defer('content'), slug=slug)
     related_posts = post.get_similar_posts()
     breadcrumbs = [
         {'name': post.category.h1, 'url': reverse('article_category_detail', args=[post.category.slug])},
         {'name': post.h1}
     ]
 
-    post.content = markdown2.markdown(post.content, extras=[
-        "fenced-code-blocks",
-        "tables",
-        "break-on-newline",
-        "header-ids",
-        "code-friendly"
-    ])
+    if not post.content_html:
+        post.content_html = render_markdown(post.content)
 
     context = get_common_article_context()
     context.update({
@@ -454,8 +392,8 @@ def article_post_detail(request, slug):
 
 def article_tagged(request, slug):
     tag = get_object_or_404(ArticleTag, slug=slug)
-    article_list = ArticlePost.objects.filter(tags=tag).select_related('category').prefetch_related('tags')
-    page_obj = handle_pagination(request, article_list)
+    article_list = ArticlePost.objects.filter(tags=tag).select_related('category').prefetch_related('tags').defer('content', 'content_html')
+    page_obj = handle_pagination(request, article_list, cache_key=f'article_tag:{tag.id}', namespace=ARTICLES_NAMESPACE)
     breadcrumbs = [{'name': 'Теги', 'url': reverse('article_tagged', args=[slug])}, {'name': tag.h1}]
 
     context = get_common_article_context()
@@ -470,8 +408,8 @@ def article_tagged(request, slug):
     return render(request, 'article_tagged.html', context)
 
 def all_articles(request):
-    article_list = ArticlePost.objects.all().select_related('category').prefetch_related('tags').order_by('-created_at')
-    page_obj = handle_pagination(request, article_list)
+    article_list = ArticlePost.objects.all().select_related('category').prefetch_related('tags').defer('content', 'content_html')
+    page_obj = handle_pagination(request, article_list, cache_key='all_articles', namespace=ARTICLES_NAMESPACE)
 
     context = get_common_article_context()
     context.update({
@@ -500,14 +438,9 @@ def form_view(request):
             'Phone': phone,
         }
 
-        try:
-            response = requests.post('https://www.homework.ru/order/form-partner/', data=data)
-            if response.status_code == 200:
-                return HttpResponse("Данные успешно отправлены.")
-            else:
-                return HttpResponse(f"Ошибка при отправке данных: {response.status_code}.")
-        except requests.exceptions.RequestException as e:
-            return HttpResponse(f"Ошибка при отправке данных: {e}")
+        # Партнёру заявку отправит команда deliver_leads: ответ не ждёт его сервера
+        enqueue_lead(data)
+        return HttpResponse("Данные успешно отправлены.")
 
     return render(request, 'sidebar_form.html')
 
@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'blog',
     'django_ckeditor_5',
     'tagulous',
@@ -163,6 +164,17 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Файлы фоновых задач импорта/экспорта (не раздаются веб-сервером)
+JOB_FILES_ROOT = os.path.join(BASE_DIR, 'job_files')
+
+# Заранее собранные карты сайта (sitemap-*.xml.gz), см. blog/sitemaps.py и команду build_sitemaps
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+# Адрес сайта для ссылок в собранных файлах: они строятся вне запроса
+SITEMAP_BASE_URL = 'https://vkomforte.su'
+
+# Приём заявок партнёра из формы заказа, отправка — командой deliver_leads
+PARTNER_ORDER_URL = 'https://www.homework.ru/order/form-partner/'
+
 # CKEditor 5 settings
 CKEDITOR_5_CONFIGS = {
     'extends': {
@@ -175,11 +187,62 @@ CKEDITOR_5_CONFIGS = {
 }
 
 
-CACHES = {
-    'default': {
+# Кэш, общий для всех воркеров gunicorn. Начальная версия пространства имён
+# (cache_utils.get_cache_version) и блокировка single-flight в get_or_build
+# полагаются на атомарный add между процессами. По умолчанию кэш лежит в файле
+# SQLite (blog.cache_backends.SQLiteCache): отдельный сервис не нужен, основная
+# БД не нагружается, add атомарен (INSERT OR IGNORE в транзакции). Файл общий
+# для процессов одной машины; если воркеры на нескольких машинах — Redis или
+# memcached (REDIS_URL / MEMCACHED_LOCATION).
+# CACHE_BACKEND=file — файловый кэш Django, только для одного процесса: его add не атомарен
+# между процессами (блокировка и начальная версия могут потеряться, и устаревшие записи
+# проживут до истечения таймаута), а очистка при переполнении обходит весь каталог.
+# CACHE_BACKEND=locmem оставляет кэш в памяти процесса (для локальной разработки)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', '')
+REDIS_URL = os.environ.get('REDIS_URL', '')
+MEMCACHED_LOCATION = os.environ.get('MEMCACHED_LOCATION', '')
+
+if CACHE_BACKEND == 'locmem':
+    SHARED_CACHE = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
     }
+elif CACHE_BACKEND == 'redis' or (not CACHE_BACKEND and REDIS_URL):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL or 'redis://127.0.0.1:6379/1',
+    }
+elif CACHE_BACKEND == 'memcached' or (not CACHE_BACKEND and MEMCACHED_LOCATION):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': MEMCACHED_LOCATION or '127.0.0.1:11211',
+    }
+elif CACHE_BACKEND == 'file':
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('FILE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'blog.cache_backends.SQLiteCache',
+        'LOCATION': os.environ.get('SQLITE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'shared.sqlite3')),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+
+CACHES = {
+    # Горячие ключи дополнительно держатся несколько секунд в памяти процесса (L1).
+    # Версии кэша читаются при каждом versioned_key, поэтому тоже живут в L1:
+    # после сброса другие воркеры перейдут на новую версию не позже чем через L1_TIMEOUT
+    'default': {
+        'BACKEND': 'blog.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_TIMEOUT': 5,
+            'L1_KEY_PREFIXES': ['cache_version', 'common_context', 'common_article_context'],
+        },
+    },
+    'shared': SHARED_CACHE,
 }
 
 SERIALIZATION_MODULES = {
@@ -2,19 +2,16 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from django.contrib.sitemaps.views import sitemap
-from blog.sitemaps import PostSitemap, CategorySitemap
-
-sitemaps_dict = {
-    'posts': PostSitemap,
-    'categories': CategorySitemap,
-}
+from blog.sitemaps import sitemap_index, sitemap_section
 
 urlpatterns = [
     path('adminikus/', admin.site.urls),
     path('ckeditor5/', include('django_ckeditor_5.urls')),
     path('', include('blog.urls')),
-    path('custom_sitemap.xml', sitemap, {'sitemaps': sitemaps_dict}, name='custom_sitemap'),
+    path('sitemap.xml', sitemap_index, name='sitemap_index'),
+    path('sitemap-<slug:section>-<int:page>.xml', sitemap_section, name='sitemap_section'),
+    # Старый адрес карты сайта, на который могли сослаться поисковики
+    path('custom_sitemap.xml', sitemap_index, name='custom_sitemap'),
 ]
 
 # Подключаем debug_toolbar и Silk только если DEBUG = True